@@ -5,9 +5,11 @@ from __future__ import annotations
 import html
 import hashlib
 import importlib
+import importlib.util
 import io
 import json
 import logging
+import re
 import tempfile
 import zipfile
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -22,19 +24,32 @@ from urllib.parse import parse_qsl
 
 import numpy as np
 import pandas as pd
-import altair as alt
-import plotly.express as px
-import plotly.graph_objects as go
 import streamlit as st
-from streamlit_plotly_events import plotly_events
+
+try:  # Optional dependency for高速なハッシュ計算
+    import xxhash  # type: ignore
+except Exception:  # pragma: no cover - 未導入の場合はhashlibのblake2bを利用
+    xxhash = None
+
+try:  # Optional dependency for文字コード判定
+    import cchardet as chardet  # type: ignore
+except Exception:  # pragma: no cover - C実装が無ければ純Python版を試す
+    try:
+        import chardet  # type: ignore
+    except Exception:  # pragma: no cover - 未導入の場合は候補エンコーディングを順に試す
+        chardet = None
 
 from data_processing import (
+    CSV_READ_ENGINE,
     DEFAULT_FIXED_COST,
     annotate_customer_segments,
     build_alerts,
+    calculate_kpi_history,
     calculate_kpis,
+    categorize_sales_columns,
     create_current_pl,
     create_default_cashflow_plan,
+    divide_or_nan,
     fetch_sales_from_endpoint,
     forecast_cashflow,
     generate_sample_cost_data,
@@ -49,6 +64,7 @@ from data_processing import (
     load_subscription_workbook,
     merge_sales_and_costs,
     monthly_sales_summary,
+    read_tabular_file,
     simulate_pl,
     compute_channel_share,
     compute_category_share,
@@ -67,6 +83,31 @@ st.set_page_config(
 logger = logging.getLogger(__name__)
 
 
+class _LazyModule:
+    """初回の属性アクセス時にモジュールを読み込む軽量プロキシ。"""
+
+    def __init__(self, module_name: str, on_load: Optional[Callable[[Any], None]] = None) -> None:
+        self._module_name = module_name
+        self._module: Any = None
+        self._on_load = on_load
+
+    def _load(self) -> Any:
+        if self._module is None:
+            self._module = importlib.import_module(self._module_name)
+            if self._on_load is not None:
+                self._on_load(self._module)
+        return self._module
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+
+# グラフ描画ライブラリは読み込みが重いため、実際に使われるまで読み込まない
+alt = _LazyModule("altair", on_load=lambda _module: register_altair_theme())
+px = _LazyModule("plotly.express", on_load=lambda _module: register_plotly_template())
+go = _LazyModule("plotly.graph_objects", on_load=lambda _module: register_plotly_template())
+
+
 def trigger_rerun() -> None:
     """Streamlitの再実行を互換性を保ちながら呼び出す。"""
 
@@ -78,20 +119,31 @@ def trigger_rerun() -> None:
     rerun_callable()
 
 
-PERIOD_FREQ_OPTIONS: List[Tuple[str, str]] = [
-    ("月次", "M"),
-    ("週次", "W-MON"),
-    ("四半期", "Q"),
-    ("年次", "Y"),
-]
+def fragment_section(func: Callable[..., Any]) -> Callable[..., Any]:
+    """対応するStreamlitでは関数をフラグメント化し、操作時にその区画だけ再実行する。"""
 
-PERIOD_YOY_LAG: Dict[str, int] = {
-    "M": 12,
-    "W-MON": 52,
-    "Q": 4,
-    "Y": 1,
+    fragment_decorator = getattr(st, "fragment", None)
+    if fragment_decorator is None:
+        fragment_decorator = getattr(st, "experimental_fragment", None)
+    if fragment_decorator is None:
+        return func
+    return fragment_decorator(func)
+
+
+# 表示ラベル -> (pandasの頻度コード, 前年同期比のラグ期間数)
+PERIOD_CONFIG: Dict[str, Tuple[str, int]] = {
+    "月次": ("M", 12),
+    "週次": ("W-MON", 52),
+    "四半期": ("Q", 4),
+    "年次": ("Y", 1),
 }
 
+PERIOD_FREQ_OPTIONS: List[Tuple[str, str]] = [
+    (label, freq) for label, (freq, _lag) in PERIOD_CONFIG.items()
+]
+PERIOD_FREQ_LOOKUP: Dict[str, str] = dict(PERIOD_FREQ_OPTIONS)
+PERIOD_YOY_LAG: Dict[str, int] = {freq: lag for freq, lag in PERIOD_CONFIG.values()}
+
 
 PLAN_WIZARD_STEPS: List[Dict[str, str]] = [
     {
@@ -492,6 +544,23 @@ EXPENSE_IMPORT_CANDIDATES: Dict[str, List[str]] = {
 }
 
 
+def build_import_alias_lookup(
+    column_candidates: Dict[str, List[str]]
+) -> Dict[str, Tuple[str, int]]:
+    """列名候補から「別名→(標準列名, 優先順位)」の逆引き表を作成する。"""
+
+    lookup: Dict[str, Tuple[str, int]] = {}
+    for target, candidates in column_candidates.items():
+        for rank, alias in enumerate(candidates):
+            # 複数の標準列に登録された別名は先に定義された列を優先する
+            lookup.setdefault(alias, (target, rank))
+    return lookup
+
+
+SALES_IMPORT_ALIASES = build_import_alias_lookup(SALES_IMPORT_CANDIDATES)
+EXPENSE_IMPORT_ALIASES = build_import_alias_lookup(EXPENSE_IMPORT_CANDIDATES)
+
+
 UPLOAD_META_MULTIPLE = "対応形式: CSV, Excel, ZIP（単体最大10MB／展開後合計はおよそ50MBまでを推奨）"
 UPLOAD_META_SINGLE = "対応形式: CSV, Excel（最大10MB・1ファイル）"
 UPLOAD_HELP_MULTIPLE = "CSV・Excelファイル、もしくはそれらをまとめたZIPをドラッグ＆ドロップで追加できます。破損ファイルは自動でスキップし、結果は下部に表示されます。"
@@ -768,65 +837,233 @@ KGI_TARGETS = {
 }
 
 
+PLOTLY_LAYOUT_DEFAULTS: Dict[str, Any] = dict(
+    font=dict(family=MCKINSEY_FONT_STACK, color=TEXT_COLOR),
+    title=dict(font=dict(size=18, color=TEXT_COLOR, family=MCKINSEY_FONT_STACK)),
+    legend=dict(bgcolor="rgba(0,0,0,0)", font=dict(size=12, color=TEXT_COLOR)),
+    plot_bgcolor="rgba(0,0,0,0)",
+    paper_bgcolor="rgba(0,0,0,0)",
+    margin=dict(l=48, r=36, t=60, b=48),
+    hoverlabel=dict(font=dict(family=MCKINSEY_FONT_STACK, color=TEXT_COLOR)),
+    colorway=PLOTLY_COLORWAY,
+)
+
+PLOTLY_AXIS_DEFAULTS: Dict[str, Any] = dict(
+    showgrid=True,
+    gridcolor="rgba(11,31,59,0.08)",
+    linecolor="rgba(11,31,59,0.2)",
+    tickfont=dict(color=MUTED_TEXT_COLOR),
+    title_font=dict(color=MUTED_TEXT_COLOR),
+)
+
+ALTAIR_AXIS_CONFIG: Dict[str, Any] = dict(
+    labelFont=MCKINSEY_FONT_STACK,
+    titleFont=MCKINSEY_FONT_STACK,
+    labelColor=MUTED_TEXT_COLOR,
+    titleColor=TEXT_COLOR,
+    gridColor="rgba(11,31,59,0.1)",
+    domainColor="rgba(11,31,59,0.18)",
+)
+
+ALTAIR_LEGEND_CONFIG: Dict[str, Any] = dict(
+    titleFont=MCKINSEY_FONT_STACK,
+    labelFont=MCKINSEY_FONT_STACK,
+    labelColor=TEXT_COLOR,
+    titleColor=MUTED_TEXT_COLOR,
+    orient="top",
+    direction="horizontal",
+    symbolSize=120,
+)
+
+ALTAIR_TITLE_CONFIG: Dict[str, Any] = dict(font=MCKINSEY_FONT_STACK, color=TEXT_COLOR, fontSize=18)
+
+
+PLOTLY_TEMPLATE_NAME = "kuraiki"
+
+
+def register_plotly_template() -> None:
+    """デザイン・トークンをPlotlyテンプレートとして登録し既定テンプレートにする。"""
+
+    import plotly.graph_objects as plotly_go
+    import plotly.io as pio
+
+    if PLOTLY_TEMPLATE_NAME not in pio.templates:
+        pio.templates[PLOTLY_TEMPLATE_NAME] = plotly_go.layout.Template(
+            layout=dict(
+                PLOTLY_LAYOUT_DEFAULTS,
+                xaxis=PLOTLY_AXIS_DEFAULTS,
+                yaxis=PLOTLY_AXIS_DEFAULTS,
+            )
+        )
+    # Streamlitテーマ（プレースホルダ色の置換）を残したまま独自スタイルを重ねる
+    default_template = f"streamlit+{PLOTLY_TEMPLATE_NAME}"
+    if "streamlit" not in pio.templates:
+        default_template = PLOTLY_TEMPLATE_NAME
+    if pio.templates.default != default_template:
+        pio.templates.default = default_template
+
+
 def apply_chart_theme(fig):
-    """デザイン・トークンに基づいたPlotly共通スタイルを適用する。"""
+    """共通スタイルは既定テンプレートで適用済みのため図をそのまま返す。"""
 
-    fig.update_layout(
-        font=dict(family=MCKINSEY_FONT_STACK, color=TEXT_COLOR),
-        title=dict(font=dict(size=18, color=TEXT_COLOR, family=MCKINSEY_FONT_STACK)),
-        legend=dict(bgcolor="rgba(0,0,0,0)", font=dict(size=12, color=TEXT_COLOR)),
-        plot_bgcolor="rgba(0,0,0,0)",
-        paper_bgcolor="rgba(0,0,0,0)",
-        margin=dict(l=48, r=36, t=60, b=48),
-        hoverlabel=dict(font=dict(family=MCKINSEY_FONT_STACK, color=TEXT_COLOR)),
-        colorway=PLOTLY_COLORWAY,
-    )
-    fig.update_xaxes(
-        showgrid=True,
-        gridcolor="rgba(11,31,59,0.08)",
-        linecolor="rgba(11,31,59,0.2)",
-        tickfont=dict(color=MUTED_TEXT_COLOR),
-        title_font=dict(color=MUTED_TEXT_COLOR),
-    )
-    fig.update_yaxes(
-        showgrid=True,
-        gridcolor="rgba(11,31,59,0.08)",
-        linecolor="rgba(11,31,59,0.2)",
-        tickfont=dict(color=MUTED_TEXT_COLOR),
-        title_font=dict(color=MUTED_TEXT_COLOR),
-    )
     return fig
 
 
-def apply_altair_theme(chart: alt.Chart) -> alt.Chart:
-    """Altairグラフに共通のスタイル・タイポグラフィを適用する。"""
+LTTB_MAX_POINTS = 2000
 
-    return (
-        chart.configure_axis(
-            labelFont=MCKINSEY_FONT_STACK,
-            titleFont=MCKINSEY_FONT_STACK,
-            labelColor=MUTED_TEXT_COLOR,
-            titleColor=TEXT_COLOR,
-            gridColor="rgba(11,31,59,0.1)",
-            domainColor="rgba(11,31,59,0.18)",
-        )
-        .configure_legend(
-            titleFont=MCKINSEY_FONT_STACK,
-            labelFont=MCKINSEY_FONT_STACK,
-            labelColor=TEXT_COLOR,
-            titleColor=MUTED_TEXT_COLOR,
-            orient="top",
-            direction="horizontal",
-            symbolSize=120,
-        )
-        .configure_view(strokeOpacity=0)
-        .configure_title(font=MCKINSEY_FONT_STACK, color=TEXT_COLOR, fontSize=18)
-        .configure_mark(font=MCKINSEY_FONT_STACK)
+
+def _numeric_axis_values(values: np.ndarray) -> np.ndarray:
+    """間引き計算用にX軸の値を数値配列へ変換する。"""
+
+    if values.dtype.kind in "Mm":
+        return values.astype("datetime64[ns]").astype(np.int64).astype(float)
+    if values.dtype.kind in "iuf":
+        return values.astype(float)
+    try:
+        converted = pd.to_datetime(pd.Series(values), errors="raise")
+    except (TypeError, ValueError):
+        return np.arange(len(values), dtype=float)
+    return converted.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(float)
+
+
+def _lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets法で残す点のインデックスを求める。"""
+
+    n_points = len(x)
+    if n_out >= n_points or n_out < 3:
+        return np.arange(n_points)
+
+    edges = np.linspace(1, n_points - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n_points - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = n_points - 1, n_points
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        area = np.abs(
+            (x[previous] - avg_x) * (bucket_y - y[previous])
+            - (x[previous] - bucket_x) * (avg_y - y[previous])
+        )
+        previous = int(start + np.argmax(area))
+        indices[bucket + 1] = previous
+    return indices
+
+
+def downsample_line_traces(fig, max_points: int = LTTB_MAX_POINTS):
+    """点数の多い折れ線トレースをLTTB法で間引き、ブラウザの描画負荷を抑える。"""
+
+    for trace in fig.data:
+        if getattr(trace, "type", None) not in {"scatter", "scattergl"}:
+            continue
+        if trace.x is None or trace.y is None or len(trace.x) <= max_points:
+            continue
+        x_values = np.asarray(trace.x)
+        y_values = np.asarray(trace.y)
+        numeric_y = pd.to_numeric(pd.Series(y_values), errors="coerce").to_numpy(dtype=float)
+        keep = _lttb_indices(
+            _numeric_axis_values(x_values), np.nan_to_num(numeric_y), max_points
+        )
+        update: Dict[str, Any] = {"x": x_values[keep], "y": y_values[keep]}
+        for attr in ("customdata", "text", "hovertext"):
+            value = getattr(trace, attr, None)
+            if value is not None and not isinstance(value, str) and len(value) == len(x_values):
+                update[attr] = np.asarray(value)[keep]
+        trace.update(update)
+    return fig
+
+
+def _first_selected_point(state_key: str) -> Optional[Dict[str, Any]]:
+    """Plotlyグラフの選択状態から最初に選択された点を取り出す。"""
+
+    event = st.session_state.get(state_key)
+    if not event:
+        return None
+    selection = event.get("selection") or {}
+    points = selection.get("points") or []
+    return points[0] if points else None
+
+
+def render_clickable_plotly_chart(
+    fig,
+    *,
+    key: str,
+    on_point_select: Callable[[Optional[Dict[str, Any]]], None],
+) -> None:
+    """クリックで選択された点（選択解除時はNone）をコールバックに渡すPlotlyグラフを描画する。"""
+
+    def _handle_select() -> None:
+        on_point_select(_first_selected_point(key))
+
+    st.plotly_chart(
+        fig,
+        use_container_width=True,
+        key=key,
+        on_select=_handle_select,
+        selection_mode=("points",),
     )
 
 
-def inject_mckinsey_style(*, dark_mode: bool = False, font_scale: float = 1.0) -> None:
-    """デザイン・トークンとマッキンゼー風スタイルをアプリに適用する。"""
+ALTAIR_THEME_NAME = "kuraiki_mckinsey"
+
+
+def _altair_theme_config() -> Dict[str, Any]:
+    """Altairテーマとして登録する共通設定を返す。"""
+
+    return {
+        "config": {
+            "axis": dict(ALTAIR_AXIS_CONFIG),
+            "legend": dict(ALTAIR_LEGEND_CONFIG),
+            "view": {"strokeOpacity": 0},
+            "title": dict(ALTAIR_TITLE_CONFIG),
+            "mark": {"font": MCKINSEY_FONT_STACK},
+        }
+    }
+
+
+def register_altair_theme() -> None:
+    """共通スタイルをAltairのテーマとして登録し、有効化する。"""
+
+    theme_api = getattr(alt, "theme", None)
+    if hasattr(theme_api, "register"):
+        # Altair 5.5以降は alt.theme.register を利用する
+        theme_api.register(ALTAIR_THEME_NAME, enable=True)(_altair_theme_config)
+    else:
+        alt.themes.register(ALTAIR_THEME_NAME, _altair_theme_config)
+        alt.themes.enable(ALTAIR_THEME_NAME)
+
+
+def apply_altair_theme(chart: alt.Chart) -> alt.Chart:
+    """Altairグラフに共通のスタイル・タイポグラフィを適用する。
+
+    スタイルは登録済みテーマで仕様生成時に適用されるため、チャートはそのまま返す。
+    """
+
+    return chart
+
+
+_CSS_WHITESPACE_PATTERN = re.compile(r"\s+")
+_CSS_SEPARATOR_PATTERN = re.compile(r"\s*([{};,>])\s*")
+
+
+def minify_css(stylesheet: str) -> str:
+    """スタイルシートの改行・インデントと区切り記号前後の空白を取り除く。"""
+
+    compact = _CSS_WHITESPACE_PATTERN.sub(" ", stylesheet).strip()
+    compact = _CSS_SEPARATOR_PATTERN.sub(r"\1", compact)
+    return compact.replace(": ", ":").replace(";}", "}")
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _build_mckinsey_css(dark_mode: bool, font_scale: float) -> str:
+    """テーマ設定ごとのスタイルシートを一度だけ組み立ててキャッシュする。"""
 
     surface_color = DARK_THEME_TOKENS["surface"] if dark_mode else SURFACE_COLOR
     background_color = DARK_THEME_TOKENS["background"] if dark_mode else BACKGROUND_COLOR
@@ -844,8 +1081,7 @@ def inject_mckinsey_style(*, dark_mode: bool = False, font_scale: float = 1.0) -
     caption_size = _scale_css_dimension(TYPOGRAPHY_TOKENS["caption"]["size"], safe_font_scale)
     caption_line_height = _scale_css_dimension(TYPOGRAPHY_TOKENS["caption"]["line_height"], safe_font_scale)
 
-    st.markdown(
-        f"""
+    stylesheet = f"""
         <style>
         :root {{
             --primary-color: {PRIMARY_COLOR};
@@ -1517,10 +1753,61 @@ def inject_mckinsey_style(*, dark_mode: bool = False, font_scale: float = 1.0) -
             font-size: 0.75rem;
         }}
         </style>
-        """,
-        unsafe_allow_html=True,
-    )
+        """
+    return minify_css(stylesheet)
+
+
+# 静的配信 (server.enableStaticServing) でスタイルシートを置くディレクトリ
+STATIC_ASSET_DIR = Path(__file__).resolve().parent / "static"
+
+
+def _static_stylesheet_supported() -> bool:
+    """静的配信が有効で、CSSが text/css として配信されるサーバーかどうかを判定する。"""
+
+    try:
+        if not st.get_option("server.enableStaticServing"):
+            return False
+        # Tornado 版サーバーは静的ファイルの .css を text/plain (nosniff) で返すため対象外
+        return importlib.util.find_spec("streamlit.web.server.app_static_file_handler") is None
+    except Exception:
+        return False
+
 
+@st.cache_resource(show_spinner=False, max_entries=8)
+def publish_static_stylesheet(stylesheet: str) -> Optional[str]:
+    """スタイルシートを内容ハッシュ付きのファイル名で static/ に書き出し、参照URLを返す。"""
+
+    if not _static_stylesheet_supported():
+        return None
+    body = stylesheet.replace("<style>", "").replace("</style>", "")
+    encoded = body.encode("utf-8")
+    filename = f"kuraiki.{content_digest(encoded)[:16]}.css"
+    target = STATIC_ASSET_DIR / filename
+    try:
+        if not target.exists():
+            STATIC_ASSET_DIR.mkdir(parents=True, exist_ok=True)
+            temp_path = target.with_suffix(".tmp")
+            temp_path.write_bytes(encoded)
+            temp_path.replace(target)
+    except OSError as exc:
+        logger.warning("Failed to publish stylesheet: %s", exc)
+        return None
+    return f"app/static/{filename}"
+
+
+def inject_mckinsey_style(*, dark_mode: bool = False, font_scale: float = 1.0) -> None:
+    """デザイン・トークンとマッキンゼー風スタイルをアプリに適用する。"""
+
+    stylesheet = _build_mckinsey_css(bool(dark_mode), float(font_scale))
+    stylesheet_url = publish_static_stylesheet(stylesheet)
+    if stylesheet_url:
+        # 再実行ごとに15KB前後のCSSを送らず、ブラウザにキャッシュされる外部CSSを参照する
+        st.markdown(
+            f'<link rel="stylesheet" href="{stylesheet_url}">',
+            unsafe_allow_html=True,
+        )
+        return
+    st.markdown(stylesheet, unsafe_allow_html=True)
 
 
 def remember_last_uploaded_files(
@@ -1553,11 +1840,11 @@ def remember_last_uploaded_files(
         st.session_state["last_uploaded"] = unique_names
 
 
-@st.cache_data(ttl=24 * 60 * 60)
-def load_sample_data() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    """サンプルデータをキャッシュして高速に提供する。"""
+@st.cache_resource(show_spinner=False)
+def load_sample_data(seed: int = 42) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """サンプルデータを一度だけ生成し、全セッションで共有する（呼び出し側はコピーして加工する）。"""
 
-    sales = generate_sample_sales_data()
+    sales = generate_sample_sales_data(seed=seed)
     if len(sales) > 3000:
         sales = sales.head(3000).copy()
     return (
@@ -1579,6 +1866,129 @@ def ensure_sample_data_cached() -> None:
     st.session_state["sample_data_rows"] = int(len(sales))
 
 
+def content_digest(data: bytes) -> str:
+    """キャッシュキー用途の非暗号ハッシュを計算する。"""
+
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _dataframe_fingerprint(df: pd.DataFrame) -> Tuple[Any, ...]:
+    """st.cache_data用にDataFrameの内容から軽量なハッシュキーを生成する。"""
+
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    except TypeError:
+        # リストなどハッシュ不能な値を含む列は文字列化して扱う
+        row_hashes = pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy()
+    digest = content_digest(memoryview(np.ascontiguousarray(row_hashes)).cast("B"))
+    return (df.shape, tuple(str(col) for col in df.columns), tuple(df.dtypes.astype(str)), digest)
+
+
+DATAFRAME_HASH_FUNCS: Dict[Any, Callable[[Any], Any]] = {pd.DataFrame: _dataframe_fingerprint}
+
+
+@st.cache_data(show_spinner=False, ttl=60 * 30, max_entries=8, hash_funcs=DATAFRAME_HASH_FUNCS)
+def detect_duplicate_rows_cached(df: pd.DataFrame) -> pd.DataFrame:
+    """キャッシュ付きで売上データの重複レコードを抽出する。"""
+
+    return detect_duplicate_rows(df)
+
+
+@st.cache_data(show_spinner=False, ttl=60 * 30, max_entries=32, hash_funcs=DATAFRAME_HASH_FUNCS)
+def compute_channel_share_cached(df: pd.DataFrame) -> pd.DataFrame:
+    """キャッシュ付きでチャネル別売上構成比を集計する。"""
+
+    return compute_channel_share(df)
+
+
+@st.cache_data(show_spinner=False, ttl=60 * 30, max_entries=32, hash_funcs=DATAFRAME_HASH_FUNCS)
+def compute_category_share_cached(df: pd.DataFrame) -> pd.DataFrame:
+    """キャッシュ付きでカテゴリ別売上構成比を集計する。"""
+
+    return compute_category_share(df)
+
+
+@st.cache_data(show_spinner=False, ttl=60 * 30, max_entries=32, hash_funcs=DATAFRAME_HASH_FUNCS)
+def compute_kpi_breakdown_cached(
+    df: pd.DataFrame,
+    dimension: str,
+    kpi_totals: Optional[Dict[str, Optional[float]]] = None,
+) -> pd.DataFrame:
+    """キャッシュ付きで指定ディメンションのKPI内訳を集計する。"""
+
+    return compute_kpi_breakdown(df, dimension, kpi_totals=kpi_totals)
+
+
+@st.cache_data(show_spinner=False, ttl=60 * 30, max_entries=32, hash_funcs=DATAFRAME_HASH_FUNCS)
+def _aggregate_sales_metrics_cached(
+    df: pd.DataFrame,
+    keys: Tuple[str, ...],
+    metrics: Tuple[Tuple[str, str, str], ...],
+    dropna: bool = True,
+) -> pd.DataFrame:
+    """キーごとの集計結果をキャッシュする（dfは集計に使う列だけに絞って渡す）。"""
+
+    named_aggregations = {name: (column, func) for name, column, func in metrics}
+    return (
+        df.groupby(list(keys), observed=True, sort=False, dropna=dropna)
+        .agg(**named_aggregations)
+        .reset_index()
+    )
+
+
+def aggregate_sales_metrics(
+    df: pd.DataFrame,
+    keys: Sequence[str],
+    metrics: Sequence[Tuple[str, str, str]],
+    *,
+    dropna: bool = True,
+) -> pd.DataFrame:
+    """(出力列名, 元の列, 集計関数) の組で指定した指標をキー別に集計する。
+
+    タブの再描画ごとに同じ集計を繰り返さないよう、必要な列だけを切り出してキャッシュ付きで計算する。
+    """
+
+    columns = list(dict.fromkeys([*keys, *(column for _, column, _ in metrics)]))
+    return _aggregate_sales_metrics_cached(
+        df[columns], tuple(keys), tuple(tuple(metric) for metric in metrics), dropna
+    )
+
+
+PRODUCT_SUMMARY_KEYS: Tuple[str, ...] = ("product_code", "product_name", "category")
+PRODUCT_SUMMARY_METRICS: Tuple[Tuple[str, str], ...] = (
+    ("sales_amount", "sum"),
+    ("net_gross_profit", "sum"),
+    ("quantity", "sum"),
+    ("estimated_cost", "sum"),
+    ("cost_rate", "mean"),
+)
+
+
+def summarize_products(df: pd.DataFrame) -> pd.DataFrame:
+    """商品単位で売上・粗利・数量・原価をまとめて1回で集計する。
+
+    カテゴリ別・商品名別のランキングもこの結果を再集計して作るため、キーが欠損した行も残しておく。
+    """
+
+    metrics = [(column, column, func) for column, func in PRODUCT_SUMMARY_METRICS if column in df.columns]
+    return aggregate_sales_metrics(df, PRODUCT_SUMMARY_KEYS, metrics, dropna=False)
+
+
+def product_detail_table(product_summary: pd.DataFrame, columns: Dict[str, str]) -> pd.DataFrame:
+    """商品別集計から明細表示用の列を選び、表示名に置き換える（キー欠損の行は除く）。"""
+
+    detail = product_summary.dropna(subset=list(PRODUCT_SUMMARY_KEYS))
+    return detail[[*PRODUCT_SUMMARY_KEYS, *columns]].rename(columns=columns).reset_index(drop=True)
+
+
+def rollup_product_summary(product_summary: pd.DataFrame, key: str, column: str) -> pd.DataFrame:
+    """商品別集計をカテゴリ・商品名などの単位に再集計する。"""
+
+    return product_summary.groupby(key, observed=True, sort=False)[column].sum().reset_index()
+
+
 @st.cache_data(show_spinner=False, ttl=60 * 30)
 def compute_customer_value_insights_cached(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
     """キャッシュ付きでRFM・バスケット分析を実行する。"""
@@ -1685,6 +2095,42 @@ def get_plan_expense_template() -> pd.DataFrame:
     return pd.DataFrame(sample_rows, columns=EXPENSE_PLAN_COLUMNS)
 
 
+@st.cache_resource(show_spinner=False)
+def _build_plan_template_frames() -> Tuple[Dict[str, pd.DataFrame], Dict[str, pd.DataFrame]]:
+    """売上・経費の計画テンプレートをDataFrameとして一度だけ構築する。"""
+
+    sales_frames = {
+        name: prepare_plan_table(rows, SALES_PLAN_COLUMNS, ["月次売上"])
+        for name, rows in SALES_PLAN_TEMPLATES.items()
+    }
+    expense_frames = {
+        name: prepare_plan_table(rows, EXPENSE_PLAN_COLUMNS, ["月次金額"])
+        for name, rows in EXPENSE_PLAN_TEMPLATES.items()
+    }
+    return sales_frames, expense_frames
+
+
+def get_sales_plan_template_df(name: str) -> pd.DataFrame:
+    """名前を指定して売上計画テンプレートのDataFrameを返す。"""
+
+    sales_frames, _ = _build_plan_template_frames()
+    template = sales_frames.get(name)
+    if template is None:
+        return prepare_plan_table(None, SALES_PLAN_COLUMNS, ["月次売上"])
+    # キャッシュ済みのテンプレートをセッション側の編集から守るため深いコピーを返す
+    return template.copy(deep=True)
+
+
+def get_expense_plan_template_df(name: str) -> pd.DataFrame:
+    """名前を指定して経費計画テンプレートのDataFrameを返す。"""
+
+    _, expense_frames = _build_plan_template_frames()
+    template = expense_frames.get(name)
+    if template is None:
+        return prepare_plan_table(None, EXPENSE_PLAN_COLUMNS, ["月次金額"])
+    return template.copy(deep=True)
+
+
 def render_onboarding_wizard(
     *,
     data_loaded: bool,
@@ -1943,6 +2389,16 @@ def render_intro_section() -> None:
     st.markdown("---")
 
 
+def _combine_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """読み込んだデータフレーム群を結合する（1件だけなら結合せずそのまま返す）。"""
+
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True, sort=False)
+
+
 def load_data(
     use_sample: bool,
     uploaded_sales: Dict[str, List],
@@ -1984,12 +2440,24 @@ def load_data(
         for report in automated_reports:
             validation_report.extend(report)
 
-    sales_df = pd.concat(sales_frames, ignore_index=True) if sales_frames else pd.DataFrame()
-    cost_df = pd.concat(cost_frames, ignore_index=True) if cost_frames else pd.DataFrame()
-    subscription_df = pd.concat(subscription_frames, ignore_index=True) if subscription_frames else pd.DataFrame()
+    sales_df = _combine_frames(sales_frames)
+    if not sales_df.empty:
+        if "order_date" in sales_df.columns:
+            if not pd.api.types.is_datetime64_any_dtype(sales_df["order_date"]):
+                # 結合後に object 型になった日付列は読み込み時に一度だけ datetime64 に揃える
+                sales_df = sales_df.assign(
+                    order_date=pd.to_datetime(sales_df["order_date"], errors="coerce", cache=True)
+                )
+            # 日付順に並べておき、期間フィルタを二分探索による連続スライスで処理できるようにする
+            sales_df = sales_df.sort_values("order_date", kind="mergesort", ignore_index=True)
+        elif len(sales_frames) == 1:
+            sales_df = sales_df.reset_index(drop=True)
+        sales_df = categorize_sales_columns(sales_df)
+    cost_df = _combine_frames(cost_frames)
+    subscription_df = _combine_frames(subscription_frames)
 
     if not sales_df.empty:
-        combined_duplicates = detect_duplicate_rows(sales_df)
+        combined_duplicates = detect_duplicate_rows_cached(sales_df)
         if not combined_duplicates.empty:
             before = len(validation_report.duplicate_rows)
             validation_report.add_duplicates(combined_duplicates)
@@ -2019,29 +2487,70 @@ def apply_filters(
     if sales_df.empty:
         return sales_df
 
-    filtered = sales_df.copy()
-    if stores and "store" in filtered.columns:
+    working = sales_df
+    date_sliced = False
+    start_ts: Optional[pd.Timestamp] = None
+    end_ts: Optional[pd.Timestamp] = None
+    if date_range:
+        start_ts = pd.Timestamp(date_range[0]) if date_range[0] else None
+        end_ts = pd.Timestamp(date_range[1]) if date_range[1] else None
+        order_dates = sales_df["order_date"]
+        if pd.api.types.is_datetime64_any_dtype(order_dates) and order_dates.is_monotonic_increasing:
+            # 日付順に並んでいれば二分探索で該当期間の連続スライスを取り出す
+            lower = (
+                int(order_dates.searchsorted(start_ts, side="left"))
+                if start_ts is not None
+                else 0
+            )
+            upper = (
+                int(order_dates.searchsorted(end_ts, side="right"))
+                if end_ts is not None
+                else len(order_dates)
+            )
+            working = sales_df.iloc[lower:upper]
+            date_sliced = True
+
+    # 条件ごとに部分DataFrameを作らず、1つのマスクにまとめてから一度だけ抽出する
+    mask = np.ones(len(working), dtype=bool)
+    if stores and "store" in working.columns:
         if isinstance(stores, (str, bytes)):
             stores = [stores]
-        filtered = filtered[filtered["store"].isin(stores)]
+        mask &= working["store"].isin(stores).to_numpy()
     if channels:
-        filtered = filtered[filtered["channel"].isin(channels)]
+        mask &= working["channel"].isin(channels).to_numpy()
     if categories:
-        filtered = filtered[filtered["category"].isin(categories)]
-    if date_range:
-        start_date = pd.to_datetime(date_range[0]) if date_range[0] else filtered["order_date"].min()
-        end_date = pd.to_datetime(date_range[1]) if date_range[1] else filtered["order_date"].max()
-        filtered = filtered[(filtered["order_date"] >= start_date) & (filtered["order_date"] <= end_date)]
-    return filtered
+        mask &= working["category"].isin(categories).to_numpy()
+    if date_range and not date_sliced:
+        order_dates = working["order_date"]
+        mask &= order_dates.notna().to_numpy()
+        if start_ts is not None:
+            mask &= (order_dates >= start_ts).to_numpy()
+        if end_ts is not None:
+            mask &= (order_dates <= end_ts).to_numpy()
+    return working.loc[mask]
+
+
+def dataframe_to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """データフレームをUTF-8のCSVバイト列に変換する。"""
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False, encoding="utf-8")
+    return buffer.getvalue()
+
+
+@st.cache_data(show_spinner=False, ttl=60 * 30, max_entries=32, hash_funcs=DATAFRAME_HASH_FUNCS)
+def dataframe_to_csv_bytes_cached(df: pd.DataFrame) -> bytes:
+    """内容が変わらないデータフレームのCSVは再シリアライズせずキャッシュから返す。"""
+
+    return dataframe_to_csv_bytes(df)
 
 
 def download_button_from_df(label: str, df: pd.DataFrame, filename: str) -> None:
     """データフレームをCSVとしてダウンロードするボタンを配置。"""
     if df is None or df.empty:
         return
-    buffer = io.StringIO()
-    df.to_csv(buffer, index=False)
-    clicked = st.download_button(label, buffer.getvalue(), file_name=filename, mime="text/csv")
+    clicked = st.download_button(
+        label, dataframe_to_csv_bytes_cached(df), file_name=filename, mime="text/csv"
+    )
     if clicked:
         display_state_message("csv_done", action_key=f"csv_done_{filename}")
 
@@ -2065,8 +2574,8 @@ def display_state_message(
         return
 
     target = container or st
-    format_kwargs = format_kwargs or {}
-    message_text = config["text"].format(**format_kwargs)
+    # 差し込み値が無い場合はテンプレートを解析せずそのまま表示する
+    message_text = config["text"].format(**format_kwargs) if format_kwargs else config["text"]
     message_type = config.get("type", "info")
     display_fn = getattr(target, message_type, target.info)
     display_fn(message_text)
@@ -2299,8 +2808,6 @@ def render_global_filter_bar(
                     st.session_state.clear()
                     trigger_rerun()
 
-    return {"expanded": st.session_state[expanded_state_key], "summary": summary_text}
-
         saved_filters = ensure_saved_filters_loaded()
         st.divider()
         st.markdown("#### フィルタプリセット")
@@ -2436,6 +2943,8 @@ def render_global_filter_bar(
                     st.session_state[preset_select_key] = preset_placeholder
                     st.success(f"『{selected_preset}』を削除しました。")
 
+    return {"expanded": st.session_state[expanded_state_key], "summary": summary_text}
+
 
 def jump_to_section(section_key: str) -> None:
     """ナビゲーションの選択を強制的に切り替えてリロードする。"""
@@ -2461,17 +2970,22 @@ def build_filter_signature(
     else:
         start_value = end_value = date_range
 
-    def _normalize_date(value: Any) -> Optional[str]:
+    def _normalize_date(value: Any) -> Optional[Union[int, str]]:
+        # 日付は通日 (toordinal) の整数にして、再実行ごとの比較を整数比較で済ませる
         if value is None:
             return None
-        if hasattr(value, "isoformat"):
+        if isinstance(value, datetime):
+            if value.time() == datetime.min.time() and value.tzinfo is None:
+                return value.toordinal()
             return value.isoformat()
+        if isinstance(value, date):
+            return value.toordinal()
         return str(value)
 
     return (
         store or "all",
-        tuple(channels or []),
-        tuple(categories or []),
+        tuple(channels or ()),
+        tuple(categories or ()),
         _normalize_date(start_value),
         _normalize_date(end_value),
         freq_label,
@@ -2534,6 +3048,33 @@ def normalize_period_state_value(
     return start, end
 
 
+# pandas 3以降はstr型が既定でArrow実装になるため、pandas 2系でのみArrow文字列型を明示する
+PLAN_LABEL_DTYPE: Any = (
+    pd.StringDtype(storage="pyarrow") if int(pd.__version__.split(".")[0]) < 3 else str
+)
+
+
+def normalize_plan_labels(values: pd.Series) -> pd.Series:
+    """計画表のラベル列を文字列化し、前後の空白をベクトル演算で取り除く。"""
+
+    labels = values.astype(str)
+    if PLAN_LABEL_DTYPE is not str:
+        labels = labels.astype(PLAN_LABEL_DTYPE)
+    return labels.str.strip()
+
+
+def coerce_numeric_column(values: pd.Series) -> pd.Series:
+    """列をfloat64に揃えて欠損を0で埋める（既にfloat64なら変換を省略する）。"""
+
+    if values.dtype != np.float64:
+        try:
+            # data_editor が返す object 列 (数値と None の混在) も型推定なしで一括変換できる
+            values = values.astype(np.float64)
+        except (TypeError, ValueError):
+            values = pd.to_numeric(values, errors="coerce").astype(np.float64)
+    return values.fillna(0.0)
+
+
 def prepare_plan_table(
     data: Any,
     columns: List[str],
@@ -2558,10 +3099,10 @@ def prepare_plan_table(
             df[column] = 0.0 if column in numeric_columns else ""
     df = df[columns]
     for column in numeric_columns:
-        df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0.0)
+        df[column] = coerce_numeric_column(df[column])
     if columns:
         label_column = columns[0]
-        df[label_column] = df[label_column].astype(str).str.strip()
+        df[label_column] = normalize_plan_labels(df[label_column])
     return df
 
 
@@ -2584,6 +3125,8 @@ def reset_plan_wizard_state() -> None:
         "expense_table": pd.DataFrame(columns=EXPENSE_PLAN_COLUMNS),
         "sales_import_hash": None,
         "expense_import_hash": None,
+        "sales_upload_key": None,
+        "expense_upload_key": None,
         "sales_import_feedback": None,
         "expense_import_feedback": None,
         "metrics": {},
@@ -2631,6 +3174,8 @@ def ensure_plan_wizard_state() -> Dict[str, Any]:
     )
     state.setdefault("sales_import_hash", None)
     state.setdefault("expense_import_hash", None)
+    state.setdefault("sales_upload_key", None)
+    state.setdefault("expense_upload_key", None)
     state.setdefault("sales_import_feedback", None)
     state.setdefault("expense_import_feedback", None)
     state.setdefault("metrics", {})
@@ -2754,17 +3299,21 @@ def append_plan_rows(
     if df is None or df.empty:
         df = pd.DataFrame(columns=[label_column, numeric_column])
 
-    existing = set(df[label_column].astype(str).str.strip())
+    candidates = list(dict.fromkeys(label for label in (str(item).strip() for item in items) if label))
+    if not candidates:
+        return df, 0
+
+    # 既存ラベルとの照合は追加候補側を isin でまとめて判定し、表全体の集合化を避ける
+    already_present = pd.Index(candidates).isin(normalize_plan_labels(df[label_column]))
     new_rows: List[Dict[str, Any]] = []
-    for item in items:
-        normalized = str(item).strip()
-        if normalized and normalized not in existing:
-            row = {label_column: normalized, numeric_column: 0.0}
-            if default_values:
-                for key, value in default_values.items():
-                    row[key] = value
-            new_rows.append(row)
-            existing.add(normalized)
+    for normalized, present in zip(candidates, already_present):
+        if present:
+            continue
+        row = {label_column: normalized, numeric_column: 0.0}
+        if default_values:
+            for key, value in default_values.items():
+                row[key] = value
+        new_rows.append(row)
 
     if new_rows:
         df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
@@ -2777,44 +3326,93 @@ def normalize_plan_import(
     column_candidates: Dict[str, List[str]],
     required_columns: List[str],
     numeric_columns: List[str],
+    alias_lookup: Optional[Dict[str, Tuple[str, int]]] = None,
 ) -> pd.DataFrame:
     """CSV取り込み時に列名を標準化し、必要列を抽出する。"""
 
     if df is None or df.empty:
         raise ValueError("CSVにデータがありません。")
 
-    working = df.copy()
-    working.columns = [str(col).strip() for col in working.columns]
-    rename_map: Dict[str, str] = {}
-    for target, candidates in column_candidates.items():
-        found = next((col for col in candidates if col in working.columns), None)
-        if found:
-            rename_map[found] = target
+    if alias_lookup is None:
+        alias_lookup = build_import_alias_lookup(column_candidates)
+
+    # 列名の照合は位置ベースで行い、入力フレーム全体の複製を避ける
+    best_match: Dict[str, Tuple[int, int]] = {}
+    for position, col in enumerate(df.columns):
+        matched = alias_lookup.get(str(col).strip())
+        if matched is None:
+            continue
+        target, rank = matched
+        if target not in best_match or rank < best_match[target][0]:
+            best_match[target] = (rank, position)
+    selected: Dict[str, int] = {
+        target: best_match[target][1] for target in column_candidates if target in best_match
+    }
 
-    missing = [col for col in required_columns if col not in rename_map.values()]
+    missing = [col for col in required_columns if col not in selected]
     if missing:
         raise ValueError(
             f"必要な列({', '.join(missing)})がCSV内に見つかりませんでした。列名を確認してください。"
         )
 
-    normalized = working[list(rename_map.keys())].rename(columns=rename_map)
+    normalized = df.iloc[:, list(selected.values())]
+    normalized.columns = list(selected.keys())
     label_column = required_columns[0]
     normalized = normalized.dropna(subset=[label_column])
-    normalized[label_column] = normalized[label_column].astype(str).str.strip()
+    normalized[label_column] = normalize_plan_labels(normalized[label_column])
     normalized = normalized[normalized[label_column] != ""]
     for column in numeric_columns:
-        normalized[column] = pd.to_numeric(normalized[column], errors="coerce").fillna(0.0)
+        normalized[column] = coerce_numeric_column(normalized[column])
     for target in column_candidates.keys():
         if target not in normalized.columns:
             normalized[target] = "" if target not in numeric_columns else 0.0
     return normalized
 
 
+PLAN_CSV_ENCODINGS: Tuple[str, ...] = ("utf-8-sig", "utf-8", "cp932", "shift_jis")
+
+
+def plan_csv_encodings(file_bytes: bytes) -> List[str]:
+    """CSVの文字コードを判定し、試行するエンコーディングを優先順に返す。"""
+
+    candidates = list(PLAN_CSV_ENCODINGS)
+    if chardet is None:
+        return candidates
+    try:
+        detected = (chardet.detect(file_bytes) or {}).get("encoding")
+    except Exception:  # pragma: no cover - 判定失敗時は既定の順序で試す
+        return candidates
+    if not detected:
+        return candidates
+    encoding = str(detected).lower().replace("_", "-")
+    if encoding in {"ascii", "utf-8"}:
+        # BOMの有無は utf-8-sig で吸収できるため既定順のままでよい
+        return candidates
+    if encoding in {"shift-jis", "sjis", "windows-31j"}:
+        encoding = "cp932"
+    if encoding not in candidates:
+        # 1バイト系の推定結果はcp932のバイト列もエラーなく読めてしまうため採用しない
+        return candidates
+    return [encoding] + [candidate for candidate in candidates if candidate != encoding]
+
+
+def read_plan_csv_bytes(file_bytes: bytes, encoding: str) -> pd.DataFrame:
+    """CSVのバイト列を文字列化せずに指定エンコーディングで読み込む。"""
+
+    if CSV_READ_ENGINE != "c":
+        try:
+            return pd.read_csv(io.BytesIO(file_bytes), encoding=encoding, engine=CSV_READ_ENGINE)
+        except Exception:
+            pass
+    return pd.read_csv(io.BytesIO(file_bytes), encoding=encoding)
+
+
 def import_plan_csv(
     file_bytes: bytes,
     column_candidates: Dict[str, List[str]],
     required_columns: List[str],
     numeric_columns: List[str],
+    alias_lookup: Optional[Dict[str, Tuple[str, int]]] = None,
 ) -> Tuple[pd.DataFrame, Optional[str]]:
     """会計ソフトからエクスポートしたCSVを標準形式に変換する。"""
 
@@ -2822,13 +3420,16 @@ def import_plan_csv(
         return pd.DataFrame(columns=required_columns), "CSVファイルが空です。"
 
     last_error: Optional[str] = None
-    for encoding in ["utf-8-sig", "utf-8", "cp932", "shift_jis"]:
+    column_error: Optional[str] = None
+    for encoding in plan_csv_encodings(file_bytes):
         try:
-            text = file_bytes.decode(encoding)
-            buffer = io.StringIO(text)
-            raw_df = pd.read_csv(buffer)
+            raw_df = read_plan_csv_bytes(file_bytes, encoding)
             normalized = normalize_plan_import(
-                raw_df, column_candidates, required_columns, numeric_columns
+                raw_df,
+                column_candidates,
+                required_columns,
+                numeric_columns,
+                alias_lookup=alias_lookup,
             )
             return normalized, None
         except UnicodeDecodeError:
@@ -2838,9 +3439,47 @@ def import_plan_csv(
             last_error = "CSVの解析に失敗しました。フォーマットを確認してください。"
             continue
         except ValueError as exc:
-            return pd.DataFrame(columns=required_columns), str(exc)
+            # 文字化けで必須列が見つからない場合もあるため、次の文字コードで再試行する
+            column_error = column_error or str(exc)
+            continue
+
+    return (
+        pd.DataFrame(columns=required_columns),
+        column_error or last_error or "CSVの読み込みに失敗しました。",
+    )
+
+
+def uploaded_file_key(uploaded: Any) -> Tuple[Any, ...]:
+    """アップロードファイルを内容を読まずに識別するための軽量なキーを返す。"""
+
+    file_id = getattr(uploaded, "file_id", None)
+    if file_id:
+        return ("id", file_id)
+    return ("name", getattr(uploaded, "name", None), getattr(uploaded, "size", None))
 
-    return pd.DataFrame(columns=required_columns), last_error or "CSVの読み込みに失敗しました。"
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def import_plan_table_cached(
+    file_hash: str,
+    _file_bytes: bytes,
+    column_candidates: Dict[str, List[str]],
+    required_columns: List[str],
+    numeric_columns: List[str],
+    plan_columns: List[str],
+    alias_lookup: Optional[Dict[str, Tuple[str, int]]] = None,
+) -> Tuple[pd.DataFrame, Optional[str]]:
+    """ファイルハッシュ単位でCSV取り込みと表の整形結果をキャッシュする。"""
+
+    imported_df, error = import_plan_csv(
+        _file_bytes,
+        column_candidates,
+        required_columns,
+        numeric_columns,
+        alias_lookup=alias_lookup,
+    )
+    if error:
+        return imported_df, error
+    return prepare_plan_table(imported_df, plan_columns, numeric_columns), None
 
 
 def calculate_plan_metrics_from_state(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -2855,8 +3494,8 @@ def calculate_plan_metrics_from_state(state: Dict[str, Any]) -> Dict[str, Any]:
 
     info = state.get("basic_info", {})
     period_months = int(info.get("plan_period_months") or 0)
-    monthly_sales = float(sales_df["月次売上"].sum()) if not sales_df.empty else 0.0
-    monthly_expenses = float(expense_df["月次金額"].sum()) if not expense_df.empty else 0.0
+    monthly_sales = float(sales_df["月次売上"].to_numpy(dtype=float).sum())
+    monthly_expenses = float(expense_df["月次金額"].to_numpy(dtype=float).sum())
     monthly_profit = monthly_sales - monthly_expenses
     margin = monthly_profit / monthly_sales if monthly_sales else np.nan
     target_margin_pct = float(info.get("target_margin") or 0.0)
@@ -2935,6 +3574,7 @@ def build_plan_summary_df(metrics: Dict[str, Any]) -> pd.DataFrame:
     return pd.DataFrame(rows)
 
 
+@st.cache_data(show_spinner=False, ttl=60 * 30, max_entries=16, hash_funcs=DATAFRAME_HASH_FUNCS)
 def compute_actual_reference(actual_sales: Optional[pd.DataFrame]) -> Dict[str, float]:
     """実績データから平均売上・利益などを算出して比較指標を返す。"""
 
@@ -2943,21 +3583,27 @@ def compute_actual_reference(actual_sales: Optional[pd.DataFrame]) -> Dict[str,
     if "order_date" not in actual_sales.columns or "sales_amount" not in actual_sales.columns:
         return {}
 
-    working = actual_sales.copy()
-    working["order_month"] = working["order_date"].dt.to_period("M")
-    monthly_sales = working.groupby("order_month")["sales_amount"].sum()
+    # Period オブジェクトを生成せず、1970年起点の通算月 (整数) で集計する。
+    month_values = np.asarray(actual_sales["order_date"].values).astype("datetime64[M]")
+    valid_mask = ~np.isnat(month_values)
+    order_months = month_values[valid_mask].astype(np.int64)
+    if valid_mask.all():
+        valid_sales = actual_sales
+    else:
+        valid_sales = actual_sales.loc[valid_mask]
+    monthly_sales = valid_sales["sales_amount"].groupby(order_months, sort=False).sum()
     reference: Dict[str, float] = {}
     if not monthly_sales.empty:
         reference["monthly_sales_avg"] = float(monthly_sales.mean())
 
     profit_column = None
-    if "net_gross_profit" in working.columns:
+    if "net_gross_profit" in actual_sales.columns:
         profit_column = "net_gross_profit"
-    elif "gross_profit" in working.columns:
+    elif "gross_profit" in actual_sales.columns:
         profit_column = "gross_profit"
 
     if profit_column:
-        monthly_profit = working.groupby("order_month")[profit_column].sum()
+        monthly_profit = valid_sales[profit_column].groupby(order_months, sort=False).sum()
         if not monthly_profit.empty:
             reference["monthly_profit_avg"] = float(monthly_profit.mean())
             sales_avg = reference.get("monthly_sales_avg")
@@ -2994,6 +3640,28 @@ def validate_plan_basic_info(info: Dict[str, Any]) -> Tuple[bool, List[str], Lis
     return len(errors) == 0, errors, warnings
 
 
+def plan_amount_flags(values: pd.Series) -> Tuple[bool, bool]:
+    """金額列に負の値・0円の行が含まれるかを1本のnumpy配列で判定する。"""
+
+    if pd.api.types.is_numeric_dtype(values):
+        amounts = values.to_numpy(dtype=float, na_value=np.nan)
+    else:
+        amounts = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    if amounts.size == 0:
+        return False, False
+    # 最小値が正なら負の値も0円も無いので、1回の走査で判定を打ち切る
+    lowest = np.fmin.reduce(amounts)
+    if not lowest <= 0:
+        return False, False
+    return bool(lowest < 0), bool((amounts == 0).any())
+
+
+def has_blank_labels(values: pd.Series) -> bool:
+    """空欄 (空白のみを含む) のラベルがあるかを配列比較で判定する。"""
+
+    return bool((normalize_plan_labels(values).to_numpy() == "").any())
+
+
 def validate_plan_sales(df: pd.DataFrame) -> Tuple[bool, List[str], List[str]]:
     """売上予測入力の妥当性を確認する。"""
 
@@ -3008,20 +3676,18 @@ def validate_plan_sales(df: pd.DataFrame) -> Tuple[bool, List[str], List[str]]:
         errors.append("売上予測の列構成が不正です。")
         return False, errors, warnings
 
-    empty_label = df["項目"].astype(str).str.strip() == ""
-    if empty_label.any():
+    if has_blank_labels(df["項目"]):
         errors.append("空欄の売上項目があります。名称を入力してください。")
 
-    negative = df["月次売上"] < 0
-    if negative.any():
+    has_negative, has_zero = plan_amount_flags(df["月次売上"])
+    if has_negative:
         errors.append("売上金額は0以上で入力してください。")
 
-    zero_rows = df["月次売上"] == 0
-    if zero_rows.any():
+    if has_zero:
         warnings.append("0円の売上項目があります。必要でなければ削除してください。")
 
-    duplicates = df["項目"].astype(str).str.strip().duplicated()
-    if duplicates.any():
+    labels = normalize_plan_labels(df["項目"]).to_numpy()
+    if len(pd.unique(labels)) < len(labels):
         warnings.append("同名の売上項目が複数あります。集計が重複する可能性があります。")
 
     return len(errors) == 0, errors, warnings
@@ -3041,19 +3707,17 @@ def validate_plan_expenses(df: pd.DataFrame) -> Tuple[bool, List[str], List[str]
         errors.append("経費計画の列構成が不正です。")
         return False, errors, warnings
 
-    empty_label = df["費目"].astype(str).str.strip() == ""
-    if empty_label.any():
+    if has_blank_labels(df["費目"]):
         errors.append("空欄の経費科目があります。名称を入力してください。")
 
-    negative = df["月次金額"] < 0
-    if negative.any():
+    has_negative, has_zero = plan_amount_flags(df["月次金額"])
+    if has_negative:
         errors.append("経費金額は0以上で入力してください。")
 
-    zero_rows = df["月次金額"] == 0
-    if zero_rows.any():
+    if has_zero:
         warnings.append("0円の経費項目があります。必要でなければ削除してください。")
 
-    if "区分" in df.columns and (df["区分"].astype(str).str.strip() == "").any():
+    if "区分" in df.columns and has_blank_labels(df["区分"]):
         warnings.append("区分が未選択の経費があります。")
 
     return len(errors) == 0, errors, warnings
@@ -3116,31 +3780,28 @@ def form_section(
     if tone and tone != "primary":
         classes.append(f"form-section--{tone}")
 
+    header_parts: List[str] = []
+    if title:
+        header_parts.append(f"<div class='form-section__title'>{html.escape(title)}</div>")
+    if description:
+        header_parts.append(
+            f"<p class='form-section__description'>{html.escape(description)}</p>"
+        )
+
     with st.container():
+        # Markdown要素は個別に閉じられ後続のウィジェットを包めないため、見出しを1要素で送る
         st.markdown(
-            f"<div class='{ ' '.join(classes) }'>", unsafe_allow_html=True
+            f"<div class='{' '.join(classes)}'>{''.join(header_parts)}</div>",
+            unsafe_allow_html=True,
         )
-        if title:
-            st.markdown(
-                f"<div class='form-section__title'>{html.escape(title)}</div>",
-                unsafe_allow_html=True,
-            )
-        if description:
-            st.markdown(
-                f"<p class='form-section__description'>{html.escape(description)}</p>",
-                unsafe_allow_html=True,
-            )
-        try:
-            yield
-        finally:
-            st.markdown("</div>", unsafe_allow_html=True)
+        yield
 
 
-def render_plan_stepper(current_step: int) -> None:
-    """ウィザードの進行状況を視覚的なタイムラインで表示する。"""
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_plan_stepper_html(current_step: int) -> str:
+    """ウィザードの進行状況タイムラインのHTMLをステップ位置ごとに一度だけ組み立てる。"""
 
     items: List[str] = []
-    total_steps = len(PLAN_WIZARD_STEPS)
     for idx, step in enumerate(PLAN_WIZARD_STEPS):
         if idx < current_step:
             state_class = "stepper__item stepper__item--done"
@@ -3153,28 +3814,22 @@ def render_plan_stepper(current_step: int) -> None:
             status = "未着手"
 
         items.append(
-            """
-            <div class="{state_class}">
-                <div class="stepper__index">{index}</div>
-                <div class="stepper__body">
-                    <div class="stepper__title">{title}</div>
-                    <div class="stepper__desc">{description}</div>
-                </div>
-                <div class="stepper__status">{status}</div>
-            </div>
-            """.format(
-                state_class=state_class,
-                index=idx + 1,
-                title=html.escape(step["title"]),
-                description=html.escape(step.get("description", "")),
-                status=status,
-            )
+            f"<div class='{state_class}'>"
+            f"<div class='stepper__index'>{idx + 1}</div>"
+            "<div class='stepper__body'>"
+            f"<div class='stepper__title'>{html.escape(step['title'])}</div>"
+            f"<div class='stepper__desc'>{html.escape(step.get('description', ''))}</div>"
+            "</div>"
+            f"<div class='stepper__status'>{status}</div>"
+            "</div>"
         )
+    return f"<div class='stepper'>{''.join(items)}</div>"
 
-    st.markdown(
-        f"<div class='stepper'>{''.join(items)}</div>",
-        unsafe_allow_html=True,
-    )
+
+def render_plan_stepper(current_step: int) -> None:
+    """ウィザードの進行状況を視覚的なタイムラインで表示する。"""
+
+    st.markdown(build_plan_stepper_html(int(current_step)), unsafe_allow_html=True)
 
 
 def render_plan_step_basic_info(state: Dict[str, Any]) -> None:
@@ -3265,6 +3920,67 @@ def render_plan_step_basic_info(state: Dict[str, Any]) -> None:
     )
 
 
+PLAN_EDITOR_COLUMN_SPECS: Dict[str, Dict[str, Any]] = {
+    "sales": {
+        "label": ("項目", "項目", "売上項目の名称を入力します。"),
+        "amount": ("月次売上", "月次売上 (円)", 50_000.0, "各項目の月次売上計画を入力します。"),
+        "choice": (
+            "チャネル",
+            "チャネル/メモ",
+            "主要チャネルやメモを選択・入力します。",
+            "主要チャネルやメモを入力します。",
+        ),
+    },
+    "expense": {
+        "label": ("費目", "費目", "経費の科目名を入力します。"),
+        "amount": ("月次金額", "月次金額 (円)", 20_000.0, "各費目の月次金額を入力します。"),
+        "choice": (
+            "区分",
+            "区分",
+            "固定費/変動費/投資などの区分を選択します。",
+            "固定費や変動費などの区分を入力します。",
+        ),
+    },
+}
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def build_plan_editor_column_config(
+    kind: str, choice_options: Tuple[str, ...]
+) -> Optional[Dict[str, Any]]:
+    """売上・経費計画エディタの列設定を種類と選択肢ごとに一度だけ組み立てる。"""
+
+    column_module = getattr(st, "column_config", None)
+    if not column_module:
+        return None
+
+    spec = PLAN_EDITOR_COLUMN_SPECS[kind]
+    label_column, label_title, label_help = spec["label"]
+    amount_column, amount_title, amount_step, amount_help = spec["amount"]
+    choice_column, choice_title, choice_help, choice_text_help = spec["choice"]
+    column_config: Dict[str, Any] = {
+        label_column: column_module.TextColumn(label_title, help=label_help),
+        amount_column: column_module.NumberColumn(
+            amount_title,
+            min_value=0.0,
+            step=amount_step,
+            help=amount_help,
+        ),
+    }
+    if hasattr(column_module, "SelectboxColumn"):
+        column_config[choice_column] = column_module.SelectboxColumn(
+            choice_title,
+            options=list(choice_options),
+            help=choice_help,
+        )
+    else:
+        column_config[choice_column] = column_module.TextColumn(
+            choice_title,
+            help=choice_text_help,
+        )
+    return column_config
+
+
 def render_plan_step_sales(state: Dict[str, Any], context: Dict[str, Any]) -> None:
     """売上予測入力ステップを描画する。"""
 
@@ -3298,26 +4014,31 @@ def render_plan_step_sales(state: Dict[str, Any], context: Dict[str, Any]) -> No
         )
         st.caption("CSVの列構成を確認できるテンプレートファイルです。")
         if uploaded is not None:
-            file_bytes = uploaded.getvalue()
-            file_hash = hashlib.md5(file_bytes).hexdigest()
-            if file_hash and state.get("sales_import_hash") != file_hash:
-                imported_df, error = import_plan_csv(
-                    file_bytes,
-                    SALES_IMPORT_CANDIDATES,
-                    ["項目", "月次売上"],
-                    ["月次売上"],
-                )
-                if error:
-                    state["sales_import_feedback"] = ("error", error)
-                else:
-                    state["sales_table"] = prepare_plan_table(
-                        imported_df, SALES_PLAN_COLUMNS, ["月次売上"]
-                    )
-                    state["sales_import_feedback"] = (
-                        "success",
-                        f"CSVから{len(state['sales_table'])}件の売上科目を読み込みました。",
+            # 同じアップロードが保持されている間は内容のハッシュ計算も省く
+            upload_key = uploaded_file_key(uploaded)
+            if state.get("sales_upload_key") != upload_key:
+                file_bytes = uploaded.getvalue()
+                file_hash = content_digest(file_bytes)
+                if file_hash and state.get("sales_import_hash") != file_hash:
+                    imported_df, error = import_plan_table_cached(
+                        file_hash,
+                        file_bytes,
+                        SALES_IMPORT_CANDIDATES,
+                        ["項目", "月次売上"],
+                        ["月次売上"],
+                        SALES_PLAN_COLUMNS,
+                        alias_lookup=SALES_IMPORT_ALIASES,
                     )
-                state["sales_import_hash"] = file_hash
+                    if error:
+                        state["sales_import_feedback"] = ("error", error)
+                    else:
+                        state["sales_table"] = imported_df
+                        state["sales_import_feedback"] = (
+                            "success",
+                            f"CSVから{len(state['sales_table'])}件の売上科目を読み込みました。",
+                        )
+                    state["sales_import_hash"] = file_hash
+                state["sales_upload_key"] = upload_key
 
         feedback = state.get("sales_import_feedback")
         if feedback:
@@ -3342,18 +4063,14 @@ def render_plan_step_sales(state: Dict[str, Any], context: Dict[str, Any]) -> No
         )
         if template_cols[1].button("読み込む", key="plan_apply_sales_template"):
             if selected_template != "テンプレートを選択":
-                template_df = pd.DataFrame(SALES_PLAN_TEMPLATES[selected_template])
-                state["sales_table"] = prepare_plan_table(
-                    template_df, SALES_PLAN_COLUMNS, ["月次売上"]
-                )
+                # テンプレートは整形済みのため、そのまま表として使う
+                state["sales_table"] = get_sales_plan_template_df(selected_template)
                 state["sales_import_feedback"] = (
                     "success",
                     f"テンプレート『{selected_template}』を適用しました。",
                 )
 
-        common_candidates = list(
-            dict.fromkeys(COMMON_SALES_ITEMS + context.get("category_options", []))
-        )
+        common_candidates = context.get("sales_item_options") or list(COMMON_SALES_ITEMS)
         selected_common = st.multiselect(
             "よく使う売上科目を追加",
             options=common_candidates,
@@ -3378,36 +4095,9 @@ def render_plan_step_sales(state: Dict[str, Any], context: Dict[str, Any]) -> No
         "売上計画の編集",
         "取り込んだ行はここで月次金額とチャネルを整えます。",
     ):
-        channel_options = list(
-            dict.fromkeys(context.get("channel_options", PLAN_CHANNEL_OPTIONS_BASE))
-        )
+        channel_options = context.get("channel_options") or list(PLAN_CHANNEL_OPTIONS_BASE)
         channel_select_options = [""] + channel_options
-        column_module = getattr(st, "column_config", None)
-        column_config = {}
-        if column_module:
-            column_config["項目"] = column_module.TextColumn(
-                "項目",
-                help="売上項目の名称を入力します。",
-            )
-            column_config["月次売上"] = column_module.NumberColumn(
-                "月次売上 (円)",
-                min_value=0.0,
-                step=50_000.0,
-                help="各項目の月次売上計画を入力します。",
-            )
-            if hasattr(column_module, "SelectboxColumn"):
-                column_config["チャネル"] = column_module.SelectboxColumn(
-                    "チャネル/メモ",
-                    options=channel_select_options,
-                    help="主要チャネルやメモを選択・入力します。",
-                )
-            else:
-                column_config["チャネル"] = column_module.TextColumn(
-                    "チャネル/メモ",
-                    help="主要チャネルやメモを入力します。",
-                )
-        else:
-            column_config = None
+        column_config = build_plan_editor_column_config("sales", tuple(channel_select_options))
 
         editor_kwargs: Dict[str, Any] = {
             "num_rows": "dynamic",
@@ -3422,15 +4112,13 @@ def render_plan_step_sales(state: Dict[str, Any], context: Dict[str, Any]) -> No
             key="plan_sales_editor",
             **editor_kwargs,
         )
-        state["sales_table"] = prepare_plan_table(
-            sales_editor_value, SALES_PLAN_COLUMNS, ["月次売上"]
-        )
+        if not sales_editor_value.equals(state["sales_table"]):
+            # 編集が無い再実行では整形済みの表をそのまま使い、再整形を省く
+            state["sales_table"] = prepare_plan_table(
+                sales_editor_value, SALES_PLAN_COLUMNS, ["月次売上"]
+            )
 
-        monthly_total = (
-            float(state["sales_table"]["月次売上"].sum())
-            if not state["sales_table"].empty
-            else 0.0
-        )
+        monthly_total = float(state["sales_table"]["月次売上"].to_numpy(dtype=float).sum())
         st.metric("月次売上計画合計", f"{monthly_total:,.0f} 円")
         st.caption("CSV取り込みとテンプレートで手入力を軽減し、小規模企業でも負荷を抑えられます。")
 
@@ -3468,26 +4156,31 @@ def render_plan_step_expenses(state: Dict[str, Any], context: Dict[str, Any]) ->
         )
         st.caption("CSVの列構成を確認できるテンプレートファイルです。")
         if uploaded is not None:
-            file_bytes = uploaded.getvalue()
-            file_hash = hashlib.md5(file_bytes).hexdigest()
-            if file_hash and state.get("expense_import_hash") != file_hash:
-                imported_df, error = import_plan_csv(
-                    file_bytes,
-                    EXPENSE_IMPORT_CANDIDATES,
-                    ["費目", "月次金額"],
-                    ["月次金額"],
-                )
-                if error:
-                    state["expense_import_feedback"] = ("error", error)
-                else:
-                    state["expense_table"] = prepare_plan_table(
-                        imported_df, EXPENSE_PLAN_COLUMNS, ["月次金額"]
-                    )
-                    state["expense_import_feedback"] = (
-                        "success",
-                        f"CSVから{len(state['expense_table'])}件の経費科目を読み込みました。",
+            # 同じアップロードが保持されている間は内容のハッシュ計算も省く
+            upload_key = uploaded_file_key(uploaded)
+            if state.get("expense_upload_key") != upload_key:
+                file_bytes = uploaded.getvalue()
+                file_hash = content_digest(file_bytes)
+                if file_hash and state.get("expense_import_hash") != file_hash:
+                    imported_df, error = import_plan_table_cached(
+                        file_hash,
+                        file_bytes,
+                        EXPENSE_IMPORT_CANDIDATES,
+                        ["費目", "月次金額"],
+                        ["月次金額"],
+                        EXPENSE_PLAN_COLUMNS,
+                        alias_lookup=EXPENSE_IMPORT_ALIASES,
                     )
-                state["expense_import_hash"] = file_hash
+                    if error:
+                        state["expense_import_feedback"] = ("error", error)
+                    else:
+                        state["expense_table"] = imported_df
+                        state["expense_import_feedback"] = (
+                            "success",
+                            f"CSVから{len(state['expense_table'])}件の経費科目を読み込みました。",
+                        )
+                    state["expense_import_hash"] = file_hash
+                state["expense_upload_key"] = upload_key
 
         feedback = state.get("expense_import_feedback")
         if feedback:
@@ -3512,10 +4205,7 @@ def render_plan_step_expenses(state: Dict[str, Any], context: Dict[str, Any]) ->
         )
         if template_cols[1].button("読み込む", key="plan_apply_expense_template"):
             if selected_template != "テンプレートを選択":
-                template_df = pd.DataFrame(EXPENSE_PLAN_TEMPLATES[selected_template])
-                state["expense_table"] = prepare_plan_table(
-                    template_df, EXPENSE_PLAN_COLUMNS, ["月次金額"]
-                )
+                state["expense_table"] = get_expense_plan_template_df(selected_template)
                 state["expense_import_feedback"] = (
                     "success",
                     f"テンプレート『{selected_template}』を適用しました。",
@@ -3545,32 +4235,9 @@ def render_plan_step_expenses(state: Dict[str, Any], context: Dict[str, Any]) ->
         "経費計画の編集",
         "費目ごとの月次金額と区分を整えます。",
     ):
-        column_module = getattr(st, "column_config", None)
-        column_config = {}
-        if column_module:
-            column_config["費目"] = column_module.TextColumn(
-                "費目",
-                help="経費の科目名を入力します。",
-            )
-            column_config["月次金額"] = column_module.NumberColumn(
-                "月次金額 (円)",
-                min_value=0.0,
-                step=20_000.0,
-                help="各費目の月次金額を入力します。",
-            )
-            if hasattr(column_module, "SelectboxColumn"):
-                column_config["区分"] = column_module.SelectboxColumn(
-                    "区分",
-                    options=PLAN_EXPENSE_CLASSIFICATIONS,
-                    help="固定費/変動費/投資などの区分を選択します。",
-                )
-            else:
-                column_config["区分"] = column_module.TextColumn(
-                    "区分",
-                    help="固定費や変動費などの区分を入力します。",
-                )
-        else:
-            column_config = None
+        column_config = build_plan_editor_column_config(
+            "expense", tuple(PLAN_EXPENSE_CLASSIFICATIONS)
+        )
 
         editor_kwargs: Dict[str, Any] = {
             "num_rows": "dynamic",
@@ -3585,19 +4252,38 @@ def render_plan_step_expenses(state: Dict[str, Any], context: Dict[str, Any]) ->
             key="plan_expense_editor",
             **editor_kwargs,
         )
-        state["expense_table"] = prepare_plan_table(
-            expense_editor_value, EXPENSE_PLAN_COLUMNS, ["月次金額"]
-        )
+        if not expense_editor_value.equals(state["expense_table"]):
+            # 編集が無い再実行では整形済みの表をそのまま使い、再整形を省く
+            state["expense_table"] = prepare_plan_table(
+                expense_editor_value, EXPENSE_PLAN_COLUMNS, ["月次金額"]
+            )
 
-        monthly_total = (
-            float(state["expense_table"]["月次金額"].sum())
-            if not state["expense_table"].empty
-            else 0.0
-        )
+        monthly_total = float(state["expense_table"]["月次金額"].to_numpy(dtype=float).sum())
         st.metric("月次経費計画合計", f"{monthly_total:,.0f} 円")
         st.caption("テンプレートと自動補完で経費入力も数クリックで完了します。")
 
 
+PLAN_SUMMARY_FORMATS: Dict[str, str] = {
+    "月次計画額": "%,.0f",
+    "年間計画額": "%,.0f",
+    "指標値": "%,.1f",
+}
+
+
+def number_column_config(df: pd.DataFrame, formats: Dict[str, str]) -> Dict[str, Any]:
+    """数値列は数値のまま渡し、表示書式だけをcolumn_configでブラウザ側に任せる。"""
+
+    return {
+        column: st.column_config.NumberColumn(
+            format=pattern,
+            # percent書式は小数第1位まで表示する（stepが表示桁数を決める）
+            step=0.001 if pattern == "percent" else None,
+        )
+        for column, pattern in formats.items()
+        if column in df.columns
+    }
+
+
 def render_plan_step_metrics(state: Dict[str, Any], context: Dict[str, Any]) -> None:
     """財務指標計算ステップを描画する。"""
 
@@ -3651,14 +4337,11 @@ def render_plan_step_metrics(state: Dict[str, Any], context: Dict[str, Any]) ->
         "計画サマリー表",
         "月次・年間の計画額を一覧で確認し、そのままCSVに出力できます。",
     ):
-        formatters: Dict[str, str] = {}
-        if "月次計画額" in summary_df.columns:
-            formatters["月次計画額"] = "{:,.0f}"
-        if "年間計画額" in summary_df.columns:
-            formatters["年間計画額"] = "{:,.0f}"
-        if "指標値" in summary_df.columns:
-            formatters["指標値"] = "{:,.1f}"
-        st.dataframe(summary_df.style.format(formatters), use_container_width=True)
+        st.dataframe(
+            summary_df,
+            use_container_width=True,
+            column_config=number_column_config(summary_df, PLAN_SUMMARY_FORMATS),
+        )
 
         if actual_reference.get("margin_avg") is not None:
             st.caption(
@@ -3669,7 +4352,7 @@ def render_plan_step_metrics(state: Dict[str, Any], context: Dict[str, Any]) ->
 def render_plan_step_review(state: Dict[str, Any], context: Dict[str, Any]) -> None:
     """ウィザード最終ステップの結果確認を描画する。"""
 
-    metrics = state.get("metrics") or calculate_plan_metrics_from_state(state)
+    metrics = calculate_plan_metrics_from_state(state)
     info = state.get("basic_info", {})
 
     st.success("入力内容を確認し、必要に応じて修正してください。")
@@ -3695,8 +4378,11 @@ def render_plan_step_review(state: Dict[str, Any], context: Dict[str, Any]) -> N
             st.info("売上予測が未入力です。前のステップで追加してください。")
         else:
             st.dataframe(
-                state["sales_table"].style.format({"月次売上": "{:,.0f}"}),
+                state["sales_table"],
                 use_container_width=True,
+                column_config=number_column_config(
+                    state["sales_table"], {"月次売上": "%,.0f"}
+                ),
             )
 
     with form_section(
@@ -3707,8 +4393,11 @@ def render_plan_step_review(state: Dict[str, Any], context: Dict[str, Any]) -> N
             st.info("経費計画が未入力です。前のステップで追加してください。")
         else:
             st.dataframe(
-                state["expense_table"].style.format({"月次金額": "{:,.0f}"}),
+                state["expense_table"],
                 use_container_width=True,
+                column_config=number_column_config(
+                    state["expense_table"], {"月次金額": "%,.0f"}
+                ),
             )
 
     with form_section(
@@ -3716,14 +4405,11 @@ def render_plan_step_review(state: Dict[str, Any], context: Dict[str, Any]) -> N
         "年間換算を含む主要指標を一覧で確認できます。",
     ):
         summary_df = build_plan_summary_df(metrics)
-        formatters: Dict[str, str] = {}
-        if "月次計画額" in summary_df.columns:
-            formatters["月次計画額"] = "{:,.0f}"
-        if "年間計画額" in summary_df.columns:
-            formatters["年間計画額"] = "{:,.0f}"
-        if "指標値" in summary_df.columns:
-            formatters["指標値"] = "{:,.1f}"
-        st.dataframe(summary_df.style.format(formatters), use_container_width=True)
+        st.dataframe(
+            summary_df,
+            use_container_width=True,
+            column_config=number_column_config(summary_df, PLAN_SUMMARY_FORMATS),
+        )
 
         download_button_from_df(
             "計画サマリーをCSVでダウンロード",
@@ -3745,35 +4431,49 @@ def render_plan_step_review(state: Dict[str, Any], context: Dict[str, Any]) -> N
         st.caption("入力内容はブラウザセッションに一時保存されます。CSVをダウンロードして関係者と共有してください。")
 
 
-def render_business_plan_wizard(actual_sales: Optional[pd.DataFrame]) -> None:
-    """経営計画ウィザードの全体を描画する。"""
+def _distinct_labels(values: pd.Series) -> List[str]:
+    """欠損と空文字を除いたラベルを出現順に重複なく返す。"""
+
+    labels = pd.unique(values.dropna().astype(str).str.strip())
+    return [label for label in labels.tolist() if label]
 
-    state = ensure_plan_wizard_state()
-    if state.get("current_step", 0) < len(PLAN_WIZARD_STEPS) - 1:
-        state["completed"] = False
 
-    channel_options = list(PLAN_CHANNEL_OPTIONS_BASE)
+@st.cache_data(show_spinner=False, ttl=60 * 30, max_entries=8, hash_funcs=DATAFRAME_HASH_FUNCS)
+def build_plan_wizard_context(actual_sales: Optional[pd.DataFrame]) -> Dict[str, Any]:
+    """実績データからウィザードで使うチャネル・カテゴリ候補と比較指標をまとめて算出する。"""
+
+    channel_labels: List[str] = []
     category_options: List[str] = []
     if actual_sales is not None and not actual_sales.empty:
         if "channel" in actual_sales.columns:
-            for channel in actual_sales["channel"].dropna().unique():
-                channel_str = str(channel).strip()
-                if channel_str and channel_str not in channel_options:
-                    channel_options.append(channel_str)
+            channel_labels = _distinct_labels(actual_sales["channel"])
         if "category" in actual_sales.columns:
-            category_options = [
-                str(cat).strip()
-                for cat in actual_sales["category"].dropna().unique()
-                if str(cat).strip()
-            ]
-
-    channel_options = list(dict.fromkeys(channel_options))
-    context = {
+            category_options = _distinct_labels(actual_sales["category"])
+
+    # 既定候補と実績由来の候補はここで一度だけ重複排除し、各ステップでは再計算しない
+    channel_options = pd.unique(
+        np.asarray(list(PLAN_CHANNEL_OPTIONS_BASE) + channel_labels, dtype=object)
+    ).tolist()
+    sales_item_options = pd.unique(
+        np.asarray(list(COMMON_SALES_ITEMS) + category_options, dtype=object)
+    ).tolist()
+    return {
         "channel_options": channel_options,
         "category_options": category_options,
+        "sales_item_options": sales_item_options,
         "actual_reference": compute_actual_reference(actual_sales),
     }
 
+
+def render_business_plan_wizard(actual_sales: Optional[pd.DataFrame]) -> None:
+    """経営計画ウィザードの全体を描画する。"""
+
+    state = ensure_plan_wizard_state()
+    if state.get("current_step", 0) < len(PLAN_WIZARD_STEPS) - 1:
+        state["completed"] = False
+
+    context = dict(build_plan_wizard_context(actual_sales))
+
     header_cols = st.columns([3, 1])
     with header_cols[0]:
         st.markdown("### 経営計画ウィザード")
@@ -3834,36 +4534,70 @@ def render_business_plan_wizard(actual_sales: Optional[pd.DataFrame]) -> None:
             state["completed"] = True
         trigger_rerun()
 
-    if step_index == total_steps - 1 and state.get("completed"):
-        st.success("経営計画ウィザードの入力が完了しました。CSV出力で関係者と共有できます。")
+    if step_index == total_steps - 1 and state.get("completed"):
+        st.success("経営計画ウィザードの入力が完了しました。CSV出力で関係者と共有できます。")
+
+
+def format_period_labels(periods: pd.Series, freq: str) -> pd.Series:
+    """期間列全体の表示ラベルをPeriodIndex上でまとめて生成する。"""
+
+    index = pd.PeriodIndex(periods)
+    if freq in {"M", "Q", "Y"}:
+        labels = index.astype(str)
+    elif freq.startswith("W"):
+        start = index.start_time
+        labels = (
+            start.strftime("%Y-%m-%d")
+            + "週 ("
+            + start.strftime("%m/%d")
+            + "〜"
+            + index.end_time.strftime("%m/%d")
+            + ")"
+        )
+    else:
+        labels = index.start_time.strftime("%Y-%m-%d") + "〜" + index.end_time.strftime("%Y-%m-%d")
+    return pd.Series(labels, index=periods.index, dtype=object)
+
+
+def _lagged_values(values: np.ndarray, lag: int) -> np.ndarray:
+    """配列をlag件後ろにずらし、先頭をNaNで埋めた配列を返す（lag=0なら全てNaN）。"""
 
+    lagged = np.full(values.shape, np.nan, dtype=np.float64)
+    if 0 < lag < len(values):
+        lagged[lag:] = values[:-lag]
+    return lagged
 
-def _nanmean(series: pd.Series) -> float:
-    """np.nanmeanの警告を避けつつ平均値を計算する。"""
 
-    if series is None:
-        return float("nan")
-    clean = pd.to_numeric(series, errors="coerce").dropna()
-    if clean.empty:
-        return float("nan")
-    return float(clean.mean())
+def _relative_change(current: np.ndarray, previous: np.ndarray) -> np.ndarray:
+    """前期値が0・欠損の行をNaNとしたまま増減率を1回の除算で求める。"""
 
+    result = np.full(current.shape, np.nan, dtype=np.float64)
+    valid = np.isfinite(previous) & (previous != 0)
+    np.divide(current - previous, previous, out=result, where=valid)
+    return result
 
-def format_period_label(period: pd.Period, freq: str) -> str:
-    """表示用の期間ラベルを生成する。"""
 
-    if freq in {"M", "Q", "Y"}:
-        return str(period)
-    start = period.start_time
-    end = period.end_time
-    if freq.startswith("W"):
-        return f"{start.strftime('%Y-%m-%d')}週 ({start.strftime('%m/%d')}〜{end.strftime('%m/%d')})"
-    return f"{start.strftime('%Y-%m-%d')}〜{end.strftime('%Y-%m-%d')}"
+# 期間別売上サマリーの算出に使う列（キャッシュキーのハッシュ対象をこれに絞る）
+SALES_PERIOD_SOURCE_COLUMNS: Tuple[str, ...] = (
+    "order_date",
+    "sales_amount",
+    "gross_profit",
+    "net_gross_profit",
+)
 
 
 def summarize_sales_by_period(df: pd.DataFrame, freq: str) -> pd.DataFrame:
     """売上と粗利を指定粒度で集計する。"""
 
+    # 各タブの最新値・ピーク・前年比はこの小さな集計表から取り出すため、重い集計側をキャッシュする
+    source_columns = [column for column in SALES_PERIOD_SOURCE_COLUMNS if column in df.columns]
+    return _summarize_sales_by_period_cached(df[source_columns], freq)
+
+
+@st.cache_data(show_spinner=False, ttl=60 * 30, max_entries=16, hash_funcs=DATAFRAME_HASH_FUNCS)
+def _summarize_sales_by_period_cached(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """必要列だけに絞った売上データから期間別サマリーを作成してキャッシュする。"""
+
     columns = [
         "period",
         "period_start",
@@ -3885,64 +4619,65 @@ def summarize_sales_by_period(df: pd.DataFrame, freq: str) -> pd.DataFrame:
     if df.empty:
         return pd.DataFrame(columns=columns)
 
-    working = df.copy()
-    working["period"] = working["order_date"].dt.to_period(freq)
+    # 売上データは日付順に整列済みのため、groupbyでは並べ替えず集計後の小さな表だけを並べ替える
+    period_keys = df["order_date"].dt.to_period(freq).rename("period")
     summary = (
-        working.groupby("period")[["sales_amount", "gross_profit", "net_gross_profit"]]
+        df.groupby(period_keys, sort=False)[["sales_amount", "gross_profit", "net_gross_profit"]]
         .sum()
         .reset_index()
         .sort_values("period")
     )
     summary["period_start"] = summary["period"].dt.to_timestamp()
     summary["period_end"] = summary["period"].dt.to_timestamp(how="end")
-    summary["period_label"] = summary["period"].apply(lambda p: format_period_label(p, freq))
+    summary["period_label"] = format_period_labels(summary["period"], freq)
 
-    summary["gross_margin_rate"] = np.where(
-        summary["sales_amount"] != 0,
-        summary["net_gross_profit"] / summary["sales_amount"],
-        np.nan,
-    )
-
-    summary["prev_period_sales"] = summary["sales_amount"].shift(1)
-    summary["sales_mom"] = np.where(
-        (summary["prev_period_sales"].notna()) & (summary["prev_period_sales"] != 0),
-        (summary["sales_amount"] - summary["prev_period_sales"]) / summary["prev_period_sales"],
-        np.nan,
+    summary["gross_margin_rate"] = divide_or_nan(
+        summary["net_gross_profit"].to_numpy(dtype=float),
+        summary["sales_amount"].to_numpy(dtype=float),
     )
 
+    sales_values = summary["sales_amount"].to_numpy(dtype=np.float64)
+    gross_values = summary["net_gross_profit"].to_numpy(dtype=np.float64)
     yoy_lag = PERIOD_YOY_LAG.get(freq, 0)
-    if yoy_lag:
-        summary["prev_year_sales"] = summary["sales_amount"].shift(yoy_lag)
-        summary["sales_yoy"] = np.where(
-            (summary["prev_year_sales"].notna()) & (summary["prev_year_sales"] != 0),
-            (summary["sales_amount"] - summary["prev_year_sales"]) / summary["prev_year_sales"],
-            np.nan,
-        )
-    else:
-        summary["prev_year_sales"] = np.nan
-        summary["sales_yoy"] = np.nan
-
-    summary["prev_period_gross"] = summary["net_gross_profit"].shift(1)
-    summary["gross_mom"] = np.where(
-        (summary["prev_period_gross"].notna()) & (summary["prev_period_gross"] != 0),
-        (summary["net_gross_profit"] - summary["prev_period_gross"]) / summary["prev_period_gross"],
-        np.nan,
-    )
 
-    if yoy_lag:
-        summary["prev_year_gross"] = summary["net_gross_profit"].shift(yoy_lag)
-        summary["gross_yoy"] = np.where(
-            (summary["prev_year_gross"].notna()) & (summary["prev_year_gross"] != 0),
-            (summary["net_gross_profit"] - summary["prev_year_gross"]) / summary["prev_year_gross"],
-            np.nan,
-        )
-    else:
-        summary["prev_year_gross"] = np.nan
-        summary["gross_yoy"] = np.nan
+    prev_period_sales = _lagged_values(sales_values, 1)
+    summary["prev_period_sales"] = prev_period_sales
+    summary["sales_mom"] = _relative_change(sales_values, prev_period_sales)
+
+    prev_year_sales = _lagged_values(sales_values, yoy_lag)
+    summary["prev_year_sales"] = prev_year_sales
+    summary["sales_yoy"] = _relative_change(sales_values, prev_year_sales)
+
+    prev_period_gross = _lagged_values(gross_values, 1)
+    summary["prev_period_gross"] = prev_period_gross
+    summary["gross_mom"] = _relative_change(gross_values, prev_period_gross)
+
+    prev_year_gross = _lagged_values(gross_values, yoy_lag)
+    summary["prev_year_gross"] = prev_year_gross
+    summary["gross_yoy"] = _relative_change(gross_values, prev_year_gross)
 
     return summary[columns]
 
 
+# 月次KPI履歴の算出に使う売上データの列（キャッシュキーのハッシュ対象をこれに絞る）
+KPI_HISTORY_SOURCE_COLUMNS: Tuple[str, ...] = ("order_month", "sales_amount", "net_gross_profit")
+
+
+@st.cache_data(show_spinner=False, ttl=60 * 30, max_entries=16, hash_funcs=DATAFRAME_HASH_FUNCS)
+def _build_kpi_history_cached(
+    kpi_source: pd.DataFrame,
+    subscription_df: Optional[pd.DataFrame],
+    overrides: Optional[Dict[str, float]],
+) -> pd.DataFrame:
+    """必要列だけに絞った売上データから月次KPI履歴を作成してキャッシュする。"""
+
+    # 月ごとに calculate_kpis を呼ばず、全月分を1回のgroupbyでまとめて算出する
+    history_df = calculate_kpi_history(kpi_source, subscription_df, overrides)
+    if "month" in history_df.columns:
+        history_df["month"] = pd.PeriodIndex(history_df["month"], freq="M")
+    return history_df
+
+
 def build_kpi_history_df(
     merged_df: pd.DataFrame,
     subscription_df: Optional[pd.DataFrame],
@@ -3953,26 +4688,26 @@ def build_kpi_history_df(
     if merged_df.empty:
         return pd.DataFrame()
 
-    months = (
-        merged_df["order_month"].dropna().sort_values().unique()
-        if "order_month" in merged_df.columns
-        else []
-    )
-    history: List[Dict[str, Any]] = []
-    for month in months:
-        kpi_row = calculate_kpis(merged_df, subscription_df, month=month, overrides=overrides)
-        if kpi_row:
-            history.append(kpi_row)
-
-    if not history:
-        return pd.DataFrame()
-
-    history_df = pd.DataFrame(history)
-    if "month" in history_df.columns:
-        history_df["month"] = pd.PeriodIndex(history_df["month"], freq="M")
-    return history_df
+    # 全列をハッシュすると再実行ごとの判定コストが大きいため、算出に使う3列だけをキーにする
+    source_columns = [column for column in KPI_HISTORY_SOURCE_COLUMNS if column in merged_df.columns]
+    return _build_kpi_history_cached(merged_df[source_columns], subscription_df, overrides)
+
+
+# 前期比較列を持つKPIと、"_prev"/"_delta" 列の接頭辞の対応
+KPI_HISTORY_DELTA_PREFIXES: Dict[str, str] = {
+    "ltv": "ltv",
+    "arpu": "arpu",
+    "churn_rate": "churn",
+    "gross_margin_rate": "gross_margin",
+    "repeat_rate": "repeat",
+    "inventory_turnover_days": "inventory_turnover",
+    "stockout_rate": "stockout",
+    "training_sessions": "training",
+    "new_product_count": "new_product",
+}
 
 
+@st.cache_data(show_spinner=False, ttl=60 * 30, max_entries=16, hash_funcs=DATAFRAME_HASH_FUNCS)
 def aggregate_kpi_history(history_df: pd.DataFrame, freq: str) -> pd.DataFrame:
     """KPI履歴を指定した粒度で集計する。"""
 
@@ -4026,19 +4761,22 @@ def aggregate_kpi_history(history_df: pd.DataFrame, freq: str) -> pd.DataFrame:
 
     working["timestamp"] = working["month"].dt.to_timestamp()
     working["period"] = working["timestamp"].dt.to_period(freq)
+    # 平均を取る列は数値化しておき、groupbyの組み込み集計（欠損は除外）で処理する
+    mean_columns = ["active_customers", "ltv", "inventory_turnover_days", "stockout_rate"]
+    working[mean_columns] = working[mean_columns].apply(pd.to_numeric, errors="coerce")
     aggregated = (
-        working.groupby("period").agg(
+        working.groupby("period", sort=False).agg(
             sales=("sales", "sum"),
             gross_profit=("gross_profit", "sum"),
             marketing_cost=("marketing_cost", "sum"),
-            active_customers=("active_customers", _nanmean),
+            active_customers=("active_customers", "mean"),
             new_customers=("new_customers", "sum"),
             repeat_customers=("repeat_customers", "sum"),
             cancelled_subscriptions=("cancelled_subscriptions", "sum"),
             previous_active_customers=("previous_active_customers", "sum"),
-            ltv=("ltv", _nanmean),
-            inventory_turnover_days=("inventory_turnover_days", _nanmean),
-            stockout_rate=("stockout_rate", _nanmean),
+            ltv=("ltv", "mean"),
+            inventory_turnover_days=("inventory_turnover_days", "mean"),
+            stockout_rate=("stockout_rate", "mean"),
             training_sessions=("training_sessions", "sum"),
             new_product_count=("new_product_count", "sum"),
         )
@@ -4050,58 +4788,56 @@ def aggregate_kpi_history(history_df: pd.DataFrame, freq: str) -> pd.DataFrame:
     aggregated.rename(columns={"active_customers": "active_customers_avg"}, inplace=True)
     aggregated["period_start"] = aggregated["period"].dt.to_timestamp()
     aggregated["period_end"] = aggregated["period"].dt.to_timestamp(how="end")
-    aggregated["period_label"] = aggregated["period"].apply(lambda p: format_period_label(p, freq))
-
-    aggregated["arpu"] = aggregated.apply(
-        lambda row: row["sales"] / row["active_customers_avg"]
-        if row["active_customers_avg"]
-        else np.nan,
-        axis=1,
-    )
-    aggregated["churn_rate"] = aggregated.apply(
-        lambda row: row["cancelled_subscriptions"] / row["previous_active_customers"]
-        if row["previous_active_customers"]
-        else np.nan,
-        axis=1,
+    aggregated["period_label"] = format_period_labels(aggregated["period"], freq)
+
+    sales = aggregated["sales"].to_numpy(dtype=float)
+    active_avg = aggregated["active_customers_avg"].to_numpy(dtype=float)
+    aggregated["arpu"] = divide_or_nan(sales, active_avg)
+    aggregated["churn_rate"] = divide_or_nan(
+        aggregated["cancelled_subscriptions"].to_numpy(dtype=float),
+        aggregated["previous_active_customers"].to_numpy(dtype=float),
     )
-    aggregated["repeat_rate"] = aggregated.apply(
-        lambda row: row["repeat_customers"] / row["active_customers_avg"]
-        if row["active_customers_avg"]
-        else np.nan,
-        axis=1,
+    aggregated["repeat_rate"] = divide_or_nan(
+        aggregated["repeat_customers"].to_numpy(dtype=float), active_avg
     )
-    aggregated["gross_margin_rate"] = aggregated.apply(
-        lambda row: row["gross_profit"] / row["sales"] if row["sales"] else np.nan,
-        axis=1,
+    aggregated["gross_margin_rate"] = divide_or_nan(
+        aggregated["gross_profit"].to_numpy(dtype=float), sales
     )
 
     aggregated.sort_values("period", inplace=True)
-    aggregated["ltv_prev"] = aggregated["ltv"].shift(1)
-    aggregated["ltv_delta"] = aggregated["ltv"] - aggregated["ltv_prev"]
-    aggregated["arpu_prev"] = aggregated["arpu"].shift(1)
-    aggregated["arpu_delta"] = aggregated["arpu"] - aggregated["arpu_prev"]
-    aggregated["churn_prev"] = aggregated["churn_rate"].shift(1)
-    aggregated["churn_delta"] = aggregated["churn_rate"] - aggregated["churn_prev"]
-    aggregated["gross_margin_prev"] = aggregated["gross_margin_rate"].shift(1)
-    aggregated["gross_margin_delta"] = aggregated["gross_margin_rate"] - aggregated["gross_margin_prev"]
-    aggregated["repeat_prev"] = aggregated["repeat_rate"].shift(1)
-    aggregated["repeat_delta"] = aggregated["repeat_rate"] - aggregated["repeat_prev"]
-    aggregated["inventory_turnover_prev"] = aggregated["inventory_turnover_days"].shift(1)
-    aggregated["inventory_turnover_delta"] = (
-        aggregated["inventory_turnover_days"] - aggregated["inventory_turnover_prev"]
-    )
-    aggregated["stockout_prev"] = aggregated["stockout_rate"].shift(1)
-    aggregated["stockout_delta"] = aggregated["stockout_rate"] - aggregated["stockout_prev"]
-    aggregated["training_prev"] = aggregated["training_sessions"].shift(1)
-    aggregated["training_delta"] = aggregated["training_sessions"] - aggregated["training_prev"]
-    aggregated["new_product_prev"] = aggregated["new_product_count"].shift(1)
-    aggregated["new_product_delta"] = (
-        aggregated["new_product_count"] - aggregated["new_product_prev"]
+    metric_columns = list(KPI_HISTORY_DELTA_PREFIXES)
+    metrics = aggregated[metric_columns]
+    previous = metrics.shift(1)
+    deltas = metrics.to_numpy(dtype=float) - previous.to_numpy(dtype=float)
+    prefixes = KPI_HISTORY_DELTA_PREFIXES.values()
+    aggregated = pd.concat(
+        [
+            aggregated,
+            previous.set_axis([f"{prefix}_prev" for prefix in prefixes], axis=1),
+            pd.DataFrame(
+                deltas,
+                columns=[f"{prefix}_delta" for prefix in prefixes],
+                index=aggregated.index,
+            ),
+        ],
+        axis=1,
     )
 
     return aggregated[columns]
 
 
+def is_missing_value(value: Any) -> bool:
+    """Noneや欠損値かどうかを判定する（floatと整数はpd.isnaを経由せずに判定する）。"""
+
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return value != value
+    if isinstance(value, (int, np.integer)):
+        return False
+    return bool(pd.isna(value))
+
+
 def format_currency(value: Optional[float]) -> str:
     """通貨表記で値を整形する。"""
 
@@ -4113,7 +4849,7 @@ def format_currency(value: Optional[float]) -> str:
 def format_percent(value: Optional[float], digits: int = 1) -> str:
     """割合値を%表示に変換する。"""
 
-    if value is None or pd.isna(value):
+    if is_missing_value(value):
         return "-"
     return f"{value * 100:.{digits}f}%"
 
@@ -4121,7 +4857,7 @@ def format_percent(value: Optional[float], digits: int = 1) -> str:
 def format_number(value: Optional[float], *, digits: int = 1, unit: str = "") -> str:
     """一般的な数値を文字列化する。"""
 
-    if value is None or pd.isna(value):
+    if is_missing_value(value):
         return "-"
     formatted = f"{value:,.{digits}f}" if digits > 0 else f"{value:,.0f}"
     return f"{formatted}{unit}"
@@ -4132,7 +4868,7 @@ def format_delta(
 ) -> Optional[str]:
     """指標変化量の表示を整える。"""
 
-    if value is None or pd.isna(value):
+    if is_missing_value(value):
         return None
     if abs(float(value)) < 1e-9:
         return None
@@ -4149,18 +4885,14 @@ def render_bsc_card(
 ) -> None:
     """バランスト・スコアカードのカードUIを描画する。"""
 
-    st.markdown("<div class='bsc-card'>", unsafe_allow_html=True)
+    header_parts = [f"<div class='bsc-card__title'>{icon} {html.escape(title)}</div>"]
+    if subtitle:
+        header_parts.append(f"<div class='bsc-card__subtitle'>{html.escape(subtitle)}</div>")
     st.markdown(
-        f"<div class='bsc-card__title'>{icon} {html.escape(title)}</div>", unsafe_allow_html=True
+        "<div class='bsc-card'>{}</div>".format("".join(header_parts)), unsafe_allow_html=True
     )
-    if subtitle:
-        st.markdown(
-            f"<div class='bsc-card__subtitle'>{html.escape(subtitle)}</div>",
-            unsafe_allow_html=True,
-        )
     for metric in metrics:
         st.metric(metric["label"], metric["value"], delta=metric.get("delta"))
-    st.markdown("</div>", unsafe_allow_html=True)
 
 
 def persistent_segmented_control(
@@ -4353,6 +5085,26 @@ def render_search_bar() -> str:
     return query
 
 
+# グローバル検索で部分一致を確認する売上データの列
+GLOBAL_SEARCH_COLUMNS: Tuple[str, ...] = ("product_name", "channel", "category")
+# 検索対象の文字列はArrow配列で持ち、連結・部分一致をC実装で処理する（pyarrowはStreamlitの依存）
+SEARCH_STRING_DTYPE = "string[pyarrow]"
+
+
+@st.cache_resource(show_spinner=False)
+def tutorial_search_index() -> Tuple[Tuple[Dict[str, Any], str], ...]:
+    """チュートリアルごとにタイトルとキーワードを小文字で1本の検索対象文字列へまとめる。"""
+
+    # 改行は検索欄から入力できないため、項目をまたいだ誤一致を防ぐ区切りとして使う
+    return tuple(
+        (
+            tutorial,
+            "\n".join([tutorial["title"], *tutorial.get("keywords", [])]).lower(),
+        )
+        for tutorial in TUTORIAL_INDEX
+    )
+
+
 def render_global_search_results(query: str, merged_df: pd.DataFrame) -> None:
     """検索クエリに一致するデータやチュートリアルをまとめて表示する。"""
 
@@ -4366,52 +5118,56 @@ def render_global_search_results(query: str, merged_df: pd.DataFrame) -> None:
         st.markdown("### クイック検索結果")
 
         if merged_df is not None and not merged_df.empty:
-            searchable = merged_df.copy()
-            for column in ["product_name", "channel", "category"]:
-                if column in searchable.columns:
-                    searchable[column] = searchable[column].astype(str)
-            fallback = pd.Series([False] * len(searchable), index=searchable.index)
-            product_series = (
-                searchable["product_name"].str.contains(query, case=False, na=False)
-                if "product_name" in searchable.columns
-                else fallback
-            )
-            channel_series = (
-                searchable["channel"].str.contains(query, case=False, na=False)
-                if "channel" in searchable.columns
-                else fallback
-            )
-            category_series = (
-                searchable["category"].str.contains(query, case=False, na=False)
-                if "category" in searchable.columns
-                else fallback
-            )
-            mask = product_series | channel_series | category_series
-            matched_sales = searchable[mask].copy()
+            # コンパイル済みパターンはpandas 2系のArrow文字列で扱えないため、エスケープ済み文字列で渡す
+            pattern = re.escape(query)
+            mask = np.zeros(len(merged_df), dtype=bool)
+            text_columns: List[pd.Series] = []
+            for column in GLOBAL_SEARCH_COLUMNS:
+                if column not in merged_df.columns:
+                    continue
+                series = merged_df[column]
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    # category型の列は語彙だけを照合し、整数コードで行へ展開する（欠損コード-1は末尾のFalse）
+                    category_hits = series.cat.categories.astype(SEARCH_STRING_DTYPE).str.contains(
+                        pattern, case=False, regex=True, na=False
+                    )
+                    hits = np.append(np.asarray(category_hits, dtype=bool), False)
+                    mask |= hits[series.cat.codes.to_numpy()]
+                else:
+                    text_columns.append(series)
+            if text_columns:
+                # 文字列列は区切り文字で連結し、1回の走査で一致行を求める
+                haystack = text_columns[0].astype(SEARCH_STRING_DTYPE).fillna("")
+                for series in text_columns[1:]:
+                    haystack = haystack + "\x1f" + series.astype(SEARCH_STRING_DTYPE).fillna("")
+                mask |= haystack.str.contains(
+                    pattern, case=False, regex=True, na=False
+                ).to_numpy(dtype=bool)
+            # 一致行は表示に使う列だけを切り出し、日付の整形は表示する先頭10件に限る
+            result_columns = [
+                column
+                for column in ("order_date", "channel", "product_name", "sales_amount")
+                if column in merged_df.columns
+            ]
+            matched_sales = merged_df.loc[mask, result_columns]
             if not matched_sales.empty and "order_date" in matched_sales.columns:
-                matched_sales.sort_values("order_date", ascending=False, inplace=True)
+                matched_sales = matched_sales.sort_values("order_date", ascending=False)
             if not matched_sales.empty:
-                display_cols = []
-                if "order_date" in matched_sales.columns:
-                    matched_sales["order_date"] = pd.to_datetime(matched_sales["order_date"])
-                    matched_sales["order_date_str"] = matched_sales["order_date"].dt.strftime("%Y-%m-%d")
-                    display_cols.append("order_date_str")
-                if "channel" in matched_sales.columns:
-                    display_cols.append("channel")
-                if "product_name" in matched_sales.columns:
-                    display_cols.append("product_name")
-                if "sales_amount" in matched_sales.columns:
-                    display_cols.append("sales_amount")
-                summary_table = matched_sales.head(10)[display_cols].rename(
+                summary_table = matched_sales.head(10)
+                if "order_date" in summary_table.columns:
+                    summary_table = summary_table.assign(
+                        order_date=summary_table["order_date"].dt.strftime("%Y-%m-%d")
+                    )
+                summary_table = summary_table.rename(
                     columns={
-                        "order_date_str": "受注日",
+                        "order_date": "受注日",
                         "channel": "チャネル",
                         "product_name": "商品名",
                         "sales_amount": "売上高",
                     }
                 )
                 if "売上高" in summary_table.columns:
-                    summary_table["売上高"] = summary_table["売上高"].map(lambda v: f"{v:,.0f}")
+                    summary_table["売上高"] = summary_table["売上高"].map("{:,.0f}".format)
                 st.dataframe(summary_table, hide_index=True, use_container_width=True)
             else:
                 st.caption("売上データに一致する項目は見つかりませんでした。")
@@ -4420,9 +5176,8 @@ def render_global_search_results(query: str, merged_df: pd.DataFrame) -> None:
 
         matches = [
             tutorial
-            for tutorial in TUTORIAL_INDEX
-            if query_lower in tutorial["title"].lower()
-            or any(query_lower in keyword.lower() for keyword in tutorial.get("keywords", []))
+            for tutorial, haystack in tutorial_search_index()
+            if query_lower in haystack
         ]
         if matches:
             st.markdown("**関連チュートリアル**")
@@ -4434,7 +5189,7 @@ def render_global_search_results(query: str, merged_df: pd.DataFrame) -> None:
 def _format_currency_compact(value: Optional[float]) -> str:
     """通貨をスペースなしの円表示に整形する。"""
 
-    if value is None or pd.isna(value):
+    if is_missing_value(value):
         return "-"
     return f"{float(value):,.0f}円"
 
@@ -4456,7 +5211,7 @@ def format_target_gap(
 ) -> Tuple[str, Optional[float]]:
     """値と目標値の差分をテキストと数値で返す。"""
 
-    if value is None or pd.isna(value) or target is None or pd.isna(target):
+    if is_missing_value(value) or is_missing_value(target):
         return "-", None
     gap = float(value) - float(target)
     if percentage:
@@ -4651,6 +5406,15 @@ def render_kgi_cards(
                 st.caption("目標差 -")
 
 
+def set_sales_cross_filter(dimension: str, value: Any) -> None:
+    """売上分析のハイライト条件をグラフで選択された値に更新する。"""
+
+    filters = st.session_state.setdefault(
+        "sales_cross_filters", {"channel": None, "category": None}
+    )
+    filters[dimension] = value
+
+
 def clear_filter_selection(filter_name: str) -> None:
     """指定したフィルタの選択状態をクリアしてリロードする。"""
 
@@ -4665,6 +5429,9 @@ def clear_filter_selection(filter_name: str) -> None:
     trigger_rerun()
 
 
+DASHBOARD_META_CHIP_TEMPLATE = "<span class='dashboard-meta__chip'>{label}: {value}</span>"
+
+
 def render_dashboard_meta(
     latest_label: str,
     period_label: str,
@@ -4684,10 +5451,9 @@ def render_dashboard_meta(
     if alert_count:
         chips.append(("⚠️ アラート", f"{alert_count} 件"))
 
+    # ラベルは固定文言のため、エスケープは値にだけ行う
     chips_html = "".join(
-        "<span class='dashboard-meta__chip'>{label}: {value}</span>".format(
-            label=html.escape(label), value=html.escape(value)
-        )
+        DASHBOARD_META_CHIP_TEMPLATE.format(label=label, value=html.escape(value))
         for label, value in chips
     )
     st.markdown(f"<div class='dashboard-meta'>{chips_html}</div>", unsafe_allow_html=True)
@@ -4775,9 +5541,16 @@ def _build_first_level_kpi_metrics(
     ):
         current_period = selected_kpi_row.get("period")
         if current_period is not None:
-            candidates = kpi_period_summary[kpi_period_summary["period"] < current_period]
-            if not candidates.empty:
-                prev_row = candidates.iloc[-1]
+            periods = pd.Index(kpi_period_summary["period"])
+            if periods.is_monotonic_increasing:
+                # 集計結果は期間順に並んでいるため、二分探索で直前の期間の行を取る
+                position = int(periods.searchsorted(current_period, side="left"))
+                if position > 0:
+                    prev_row = kpi_period_summary.iloc[position - 1]
+            else:
+                candidates = kpi_period_summary[kpi_period_summary["period"] < current_period]
+                if not candidates.empty:
+                    prev_row = candidates.iloc[-1]
 
     metrics: List[Dict[str, Any]] = []
 
@@ -4952,11 +5725,13 @@ def render_active_kpi_details(
     detail_container = st.container()
     with detail_container:
         header_col, close_col = st.columns([6, 1])
-        close_clicked = close_col.button("閉じる", key="close_kpi_drilldown_button")
+        close_clicked = close_col.button(
+            "閉じる",
+            key="close_kpi_drilldown_button",
+            on_click=lambda: st.session_state.update(active_kpi_drilldown=None),
+        )
         header_col.subheader(f"{metric['label']}の詳細")
         if close_clicked:
-            st.session_state["active_kpi_drilldown"] = None
-            trigger_rerun()
             return
 
         st.metric(
@@ -4965,9 +5740,9 @@ def render_active_kpi_details(
             delta=metric.get("delta_text"),
         )
 
-        history = kpi_period_summary[["period_start", "period_label", value_column]].copy()
-        history["period_start"] = pd.to_datetime(history["period_start"], errors="coerce")
-        history.dropna(subset=["period_start"], inplace=True)
+        history = kpi_period_summary[["period_start", "period_label", value_column]].dropna(
+            subset=["period_start"]
+        )
         history.sort_values("period_start", inplace=True)
         history = history.tail(12)
         history.dropna(subset=[value_column], inplace=True)
@@ -5012,6 +5787,16 @@ def render_active_kpi_details(
         st.dataframe(table_df, use_container_width=True)
 
 
+@fragment_section
+def render_kpi_drilldown_section(
+    kpi_period_summary: pd.DataFrame, selected_kpi_row: pd.Series
+) -> None:
+    """KPIカードと詳細ビューをまとめて描画する（カード操作時はこの区画のみ再実行）。"""
+
+    kpi_metrics = render_first_level_kpi_strip(kpi_period_summary, selected_kpi_row)
+    render_active_kpi_details(kpi_period_summary, kpi_metrics)
+
+
 def render_kpi_overview_tab(kpi_period_summary: pd.DataFrame) -> None:
     """KPIタブ向けに主要指標のトレンドとテーブルを表示する。"""
 
@@ -5019,9 +5804,7 @@ def render_kpi_overview_tab(kpi_period_summary: pd.DataFrame) -> None:
         st.info("KPI履歴が読み込まれていません。")
         return
 
-    history = kpi_period_summary.tail(12).copy()
-    history["period_start"] = pd.to_datetime(history["period_start"])
-    history["period_label"] = history["period_label"].astype(str)
+    history = kpi_period_summary.tail(12).assign(period_label=lambda d: d["period_label"].astype(str))
 
     metric_configs = [
         ("ltv", "LTV", "円", ACCENT_COLOR, False),
@@ -5088,6 +5871,70 @@ def render_kpi_overview_tab(kpi_period_summary: pd.DataFrame) -> None:
         st.info("KPIサマリーを表示する列が不足しています。")
 
 
+# 売上推移グラフで系列として描く列と凡例ラベル
+SALES_TREND_SERIES_LABELS: Dict[str, str] = {
+    "sales_amount": "現状売上",
+    "prev_year_sales": "前年同期間売上",
+}
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def build_sales_trend_chart_template(
+    granularity_label: str,
+    value_columns: Tuple[str, ...],
+    sales_target: Optional[float],
+) -> alt.LayerChart:
+    """売上推移グラフのデータ以外の仕様を組み立て、粒度・系列の組み合わせごとに使い回す。"""
+
+    color_range = [
+        YOY_SERIES_COLOR if column == "前年同期間売上" else SALES_SERIES_COLOR
+        for column in value_columns
+    ]
+    sales_line = alt.Chart().mark_line(
+        point=alt.OverlayMarkDef(size=70, filled=True)
+    ).encode(
+        x=alt.X(
+            "期間開始:T",
+            title=f"{granularity_label}開始日",
+            axis=alt.Axis(format="%Y-%m", labelOverlap=True),
+        ),
+        y=alt.Y(
+            "金額:Q",
+            title="売上高 (円)",
+            axis=alt.Axis(format=",.0f"),
+        ),
+        color=alt.Color(
+            "指標:N",
+            scale=alt.Scale(domain=list(value_columns), range=color_range),
+            legend=alt.Legend(title="系列"),
+        ),
+        tooltip=[
+            alt.Tooltip("期間:T", title="期間"),
+            alt.Tooltip("指標:N", title="系列"),
+            alt.Tooltip("金額:Q", title="金額", format=",.0f"),
+        ],
+    )
+
+    chart_layers: List[alt.Chart] = [sales_line]
+    if sales_target is not None and not pd.isna(sales_target):
+        target_df = pd.DataFrame({"基準": ["売上目標"], "金額": [float(sales_target)]})
+        target_rule = alt.Chart(target_df).mark_rule(strokeDash=[6, 4]).encode(
+            y="金額:Q",
+            color=alt.Color(
+                "基準:N",
+                scale=alt.Scale(domain=["売上目標"], range=[BASELINE_SERIES_COLOR]),
+                legend=alt.Legend(title="基準"),
+            ),
+            tooltip=[alt.Tooltip("金額:Q", title="売上目標", format=",.0f")],
+        )
+        chart_layers.append(target_rule)
+
+    sales_chart = alt.layer(*chart_layers).resolve_scale(color="independent").properties(
+        height=320,
+    )
+    return apply_altair_theme(sales_chart)
+
+
 def render_sales_tab(
     merged_df: pd.DataFrame,
     period_summary: pd.DataFrame,
@@ -5135,85 +5982,31 @@ def render_sales_tab(
             "<div class='chart-section__header'><div class='chart-section__title'>売上推移</div></div>",
             unsafe_allow_html=True,
         )
-        latest_periods = period_summary.tail(12).copy()
-        latest_periods["period_start"] = pd.to_datetime(latest_periods["period_start"])
-        sales_chart_source = latest_periods.rename(
-            columns={
-                "period_start": "期間開始",
-                "period_label": "期間",
-                "sales_amount": "現状売上",
-                "prev_year_sales": "前年同期間売上",
-            }
-        )
-        value_columns = [
-            col for col in ["現状売上", "前年同期間売上"] if col in sales_chart_source.columns
+        latest_periods = period_summary.tail(12)
+        source_columns = [
+            col for col in SALES_TREND_SERIES_LABELS if col in latest_periods.columns
         ]
+        value_columns = [SALES_TREND_SERIES_LABELS[col] for col in source_columns]
         if value_columns:
-            melted = (
-                sales_chart_source.melt(
-                    id_vars=["期間開始", "期間"],
-                    value_vars=value_columns,
-                    var_name="指標",
-                    value_name="金額",
-                )
-                .dropna(subset=["金額"])
-                .sort_values("期間開始")
-            )
-            color_domain: List[str] = []
-            color_range: List[str] = []
-            for column in value_columns:
-                color_domain.append(column)
-                if column == "現状売上":
-                    color_range.append(SALES_SERIES_COLOR)
-                elif column == "前年同期間売上":
-                    color_range.append(YOY_SERIES_COLOR)
-                else:
-                    color_range.append(SALES_SERIES_COLOR)
-
-            sales_line = alt.Chart(melted).mark_line(
-                point=alt.OverlayMarkDef(size=70, filled=True)
-            ).encode(
-                x=alt.X(
-                    "期間開始:T",
-                    title=f"{selected_granularity_label}開始日",
-                    axis=alt.Axis(format="%Y-%m", labelOverlap=True),
-                ),
-                y=alt.Y(
-                    "金額:Q",
-                    title="売上高 (円)",
-                    axis=alt.Axis(format=",.0f"),
-                ),
-                color=alt.Color(
-                    "指標:N",
-                    scale=alt.Scale(domain=color_domain, range=color_range),
-                    legend=alt.Legend(title="系列"),
-                ),
-                tooltip=[
-                    alt.Tooltip("期間:T", title="期間"),
-                    alt.Tooltip("指標:N", title="系列"),
-                    alt.Tooltip("金額:Q", title="金額", format=",.0f"),
-                ],
-            )
-
-            chart_layers: List[alt.Chart] = [sales_line]
-            sales_target = KGI_TARGETS.get("sales")
-            if sales_target is not None and not pd.isna(sales_target):
-                target_df = pd.DataFrame({"基準": ["売上目標"], "金額": [float(sales_target)]})
-                target_rule = alt.Chart(target_df).mark_rule(strokeDash=[6, 4]).encode(
-                    y="金額:Q",
-                    color=alt.Color(
-                        "基準:N",
-                        scale=alt.Scale(domain=["売上目標"], range=[BASELINE_SERIES_COLOR]),
-                        legend=alt.Legend(title="基準"),
+            # melt を介さず、期間ごとに系列が並ぶ縦持ちデータを配列から直接組み立てる
+            series_count = len(source_columns)
+            amounts = latest_periods[source_columns].to_numpy(dtype=float).ravel()
+            melted = pd.DataFrame(
+                {
+                    "期間開始": np.repeat(
+                        latest_periods["period_start"].to_numpy(), series_count
                     ),
-                    tooltip=[alt.Tooltip("金額:Q", title="売上目標", format=",.0f")],
-                )
-                chart_layers.append(target_rule)
-
-            sales_chart = alt.layer(*chart_layers).resolve_scale(color="independent").properties(
-                height=320,
-            )
-            sales_chart = apply_altair_theme(sales_chart)
+                    "期間": np.repeat(latest_periods["period_label"].to_numpy(), series_count),
+                    "指標": np.tile(value_columns, len(latest_periods)),
+                    "金額": amounts,
+                }
+            )[~np.isnan(amounts)]
+            # 軸・凡例などの仕様はキャッシュ済みのテンプレートを使い、データだけを差し替える
+            sales_chart = build_sales_trend_chart_template(
+                selected_granularity_label,
+                tuple(value_columns),
+                KGI_TARGETS.get("sales"),
+            ).properties(data=melted)
             st.altair_chart(sales_chart, use_container_width=True)
         else:
             st.caption("売上推移を表示するための指標が不足しています。")
@@ -5247,12 +6040,14 @@ def render_sales_tab(
         )
         chart_cols = st.columns(2)
         if channel_share_df is not None and not channel_share_df.empty:
-            channel_rank = channel_share_df.sort_values("sales_amount", ascending=False).copy()
-            channel_rank["構成比"] = channel_rank["sales_amount"] / channel_rank["sales_amount"].sum()
-            channel_rank.rename(
-                columns={"channel": "チャネル", "sales_amount": "売上高"}, inplace=True
+            # 構成比は全チャネルの合計を分母にし、表示する上位10件だけを取り出す
+            channel_total = channel_share_df["sales_amount"].sum()
+            channel_rank = (
+                channel_share_df.nlargest(10, "sales_amount")
+                .assign(構成比=lambda d: d["sales_amount"] / channel_total)
+                .rename(columns={"channel": "チャネル", "sales_amount": "売上高"})
             )
-            bar = alt.Chart(channel_rank.head(10)).mark_bar(
+            bar = alt.Chart(channel_rank).mark_bar(
                 cornerRadiusTopLeft=3,
                 cornerRadiusTopRight=3,
             ).encode(
@@ -5265,7 +6060,7 @@ def render_sales_tab(
                     alt.Tooltip("構成比:Q", title="構成比", format=".1%"),
                 ],
             )
-            labels = alt.Chart(channel_rank.head(10)).mark_text(
+            labels = alt.Chart(channel_rank).mark_text(
                 align="left",
                 baseline="middle",
                 dx=6,
@@ -5294,14 +6089,13 @@ def render_sales_tab(
             chart_cols[0].info("チャネル別の集計データがありません。")
 
         if category_share_df is not None and not category_share_df.empty:
-            category_rank = category_share_df.sort_values("sales_amount", ascending=False).copy()
-            category_rank["構成比"] = (
-                category_rank["sales_amount"] / category_rank["sales_amount"].sum()
+            category_total = category_share_df["sales_amount"].sum()
+            category_rank = (
+                category_share_df.nlargest(10, "sales_amount")
+                .assign(構成比=lambda d: d["sales_amount"] / category_total)
+                .rename(columns={"category": "カテゴリ", "sales_amount": "売上高"})
             )
-            category_rank.rename(
-                columns={"category": "カテゴリ", "sales_amount": "売上高"}, inplace=True
-            )
-            bar = alt.Chart(category_rank.head(10)).mark_bar(
+            bar = alt.Chart(category_rank).mark_bar(
                 cornerRadiusTopLeft=3,
                 cornerRadiusTopRight=3,
                 color=GROSS_SERIES_COLOR,
@@ -5314,7 +6108,7 @@ def render_sales_tab(
                     alt.Tooltip("構成比:Q", title="構成比", format=".1%"),
                 ],
             )
-            labels = alt.Chart(category_rank.head(10)).mark_text(
+            labels = alt.Chart(category_rank).mark_text(
                 align="left",
                 baseline="middle",
                 dx=6,
@@ -5414,23 +6208,18 @@ def render_sales_tab(
             st.info("売上データがありません。")
         else:
             detail_df = (
-                merged_df.groupby(["product_code", "product_name", "category"])
-                .agg(
-                    売上高=("sales_amount", "sum"),
-                    粗利=("net_gross_profit", "sum"),
-                    販売数量=("quantity", "sum"),
+                product_detail_table(
+                    summarize_products(merged_df),
+                    {"sales_amount": "売上高", "net_gross_profit": "粗利", "quantity": "販売数量"},
                 )
-                .reset_index()
-                .sort_values("売上高", ascending=False)
-                .head(50)
+                .nlargest(50, "売上高")
             )
             if detail_df.empty:
                 st.info("表示できる明細がありません。")
             else:
-                detail_df["粗利率"] = np.where(
-                    detail_df["売上高"] != 0,
-                    detail_df["粗利"] / detail_df["売上高"],
-                    np.nan,
+                detail_df["粗利率"] = divide_or_nan(
+                    detail_df["粗利"].to_numpy(dtype=float),
+                    detail_df["売上高"].to_numpy(dtype=float),
                 )
                 display_df = detail_df.rename(
                     columns={
@@ -5470,6 +6259,15 @@ def render_sales_tab(
                     )
 
 
+GROSS_DETAIL_FORMATS: Dict[str, str] = {
+    "売上高": "%,.0f",
+    "粗利": "%,.0f",
+    "推定原価": "%,.0f",
+    "原価率": "percent",
+    "粗利率": "percent",
+}
+
+
 def render_gross_tab(
     merged_df: pd.DataFrame,
     period_summary: pd.DataFrame,
@@ -5478,26 +6276,33 @@ def render_gross_tab(
 ) -> None:
     """粗利タブのグラフと明細を描画する。"""
 
+    # カテゴリ別・商品名別のランキングと明細は、この商品別集計1回分から切り出す
+    product_summary = (
+        summarize_products(merged_df) if merged_df is not None and not merged_df.empty else None
+    )
+
     if period_summary is not None and not period_summary.empty:
         st.markdown("<div class='chart-section'>", unsafe_allow_html=True)
         st.markdown(
             "<div class='chart-section__header'><div class='chart-section__title'>粗利と粗利率の推移</div></div>",
             unsafe_allow_html=True,
         )
-        latest_periods = period_summary.tail(12).copy()
-        latest_periods["period_start"] = pd.to_datetime(latest_periods["period_start"])
+        latest_periods = period_summary.tail(12)
 
         if "gross_margin_rate" not in latest_periods.columns:
             if {"net_gross_profit", "sales_amount"}.issubset(latest_periods.columns):
-                latest_periods["gross_margin_rate"] = np.where(
-                    latest_periods["sales_amount"] != 0,
-                    latest_periods["net_gross_profit"] / latest_periods["sales_amount"],
-                    np.nan,
+                latest_periods = latest_periods.assign(
+                    gross_margin_rate=divide_or_nan(
+                        latest_periods["net_gross_profit"].to_numpy(dtype=float),
+                        latest_periods["sales_amount"].to_numpy(dtype=float),
+                    )
                 )
             else:
-                latest_periods["gross_margin_rate"] = np.nan
+                latest_periods = latest_periods.assign(gross_margin_rate=np.nan)
 
-        latest_periods["gross_margin_pct"] = latest_periods["gross_margin_rate"] * 100
+        latest_periods = latest_periods.assign(
+            gross_margin_pct=lambda d: d["gross_margin_rate"] * 100
+        )
 
         gross_bar = alt.Chart(latest_periods).mark_bar(color=GROSS_SERIES_COLOR).encode(
             x=alt.X(
@@ -5590,7 +6395,8 @@ def render_gross_tab(
         )
         chart_cols = st.columns(2)
         category_gross = (
-            merged_df.groupby("category")["net_gross_profit"].sum().reset_index().sort_values("net_gross_profit", ascending=False).head(10)
+            rollup_product_summary(product_summary, "category", "net_gross_profit")
+            .nlargest(10, "net_gross_profit")
         )
         if not category_gross.empty:
             category_gross.rename(
@@ -5637,7 +6443,8 @@ def render_gross_tab(
             chart_cols[0].info("カテゴリ別の粗利データがありません。")
 
         product_gross = (
-            merged_df.groupby("product_name")["net_gross_profit"].sum().reset_index().sort_values("net_gross_profit", ascending=False).head(10)
+            rollup_product_summary(product_summary, "product_name", "net_gross_profit")
+            .nlargest(10, "net_gross_profit")
         )
         if not product_gross.empty:
             product_gross.rename(
@@ -5731,35 +6538,30 @@ def render_gross_tab(
         if merged_df is None or merged_df.empty:
             st.info("データがありません。")
         else:
-            detail_df = (
-                merged_df.groupby(["product_code", "product_name", "category"])
-                .agg(
-                    売上高=("sales_amount", "sum"),
-                    粗利=("net_gross_profit", "sum"),
-                    推定原価=("estimated_cost", "sum"),
-                    原価率=("cost_rate", "mean"),
-                )
-                .reset_index()
+            detail_df = product_detail_table(
+                product_summary,
+                {
+                    "sales_amount": "売上高",
+                    "net_gross_profit": "粗利",
+                    "estimated_cost": "推定原価",
+                    "cost_rate": "原価率",
+                },
             )
             if detail_df.empty:
                 st.info("表示できる明細がありません。")
             else:
-                detail_df["粗利率"] = np.where(
-                    detail_df["売上高"] != 0,
-                    detail_df["粗利"] / detail_df["売上高"],
-                    np.nan,
+                detail_df["粗利率"] = divide_or_nan(
+                    detail_df["粗利"].to_numpy(dtype=float),
+                    detail_df["売上高"].to_numpy(dtype=float),
                 )
                 detail_df.sort_values("粗利", ascending=False, inplace=True)
-                display_df = detail_df.copy()
-                for column in ["売上高", "粗利", "推定原価"]:
-                    display_df[column] = display_df[column].map(lambda v: f"{v:,.0f}")
-                display_df["原価率"] = display_df["原価率"].map(
-                    lambda v: f"{v * 100:.1f}%" if pd.notna(v) else "-"
-                )
-                display_df["粗利率"] = display_df["粗利率"].map(
-                    lambda v: f"{v * 100:.1f}%" if pd.notna(v) else "-"
+                display_df = detail_df.head(50)
+                st.dataframe(
+                    display_df,
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config=number_column_config(display_df, GROSS_DETAIL_FORMATS),
                 )
-                st.dataframe(display_df.head(50), hide_index=True, use_container_width=True)
                 toolbar = st.columns(2)
                 with toolbar[0]:
                     download_button_from_df("CSV出力", detail_df, "gross_profit_detail.csv")
@@ -5782,7 +6584,7 @@ def render_store_comparison_chart(analysis_df: pd.DataFrame, fixed_cost: float)
         return
 
     store_summary = (
-        analysis_df.groupby("store")[["sales_amount", "net_gross_profit"]]
+        analysis_df.groupby("store", observed=True)[["sales_amount", "net_gross_profit"]]
         .sum()
         .reset_index()
     )
@@ -5851,7 +6653,7 @@ def render_abc_analysis(df: pd.DataFrame) -> None:
         return
 
     product_sales = (
-        df.groupby(["product_code", "product_name"])["sales_amount"]
+        df.groupby(["product_code", "product_name"], sort=False)["sales_amount"]
         .sum()
         .reset_index()
         .sort_values("sales_amount", ascending=False)
@@ -5949,7 +6751,9 @@ def render_inventory_heatmap(
         turnover_days = 45.0
 
     inventory_value = (
-        merged_df.groupby(["store", "category"])["estimated_cost"].sum().reset_index()
+        merged_df.groupby(["store", "category"], observed=True, sort=False)["estimated_cost"]
+        .sum()
+        .reset_index()
     )
     if inventory_value.empty:
         st.info("在庫を推計できるカテゴリデータがありません。")
@@ -5992,6 +6796,14 @@ def render_inventory_heatmap(
     )
 
 
+INVENTORY_DETAIL_FORMATS: Dict[str, str] = {
+    "販売数量": "%,.0f",
+    "売上高": "%,.0f",
+    "推定原価": "%,.0f",
+    "推定在庫金額": "%,.0f",
+}
+
+
 def render_inventory_tab(
     merged_df: pd.DataFrame,
     kpi_period_summary: pd.DataFrame,
@@ -6000,14 +6812,18 @@ def render_inventory_tab(
 ) -> None:
     """在庫タブの主要指標と推計表を表示する。"""
 
+    # カテゴリ別・商品名別のランキングと明細は、この商品別集計1回分から切り出す
+    product_summary = (
+        summarize_products(merged_df) if merged_df is not None and not merged_df.empty else None
+    )
+
     if kpi_period_summary is not None and not kpi_period_summary.empty:
         st.markdown("<div class='chart-section'>", unsafe_allow_html=True)
         st.markdown(
             "<div class='chart-section__header'><div class='chart-section__title'>在庫KPIの推移</div></div>",
             unsafe_allow_html=True,
         )
-        history = kpi_period_summary.tail(12).copy()
-        history["period_start"] = pd.to_datetime(history["period_start"])
+        history = kpi_period_summary.tail(12)
         chart_cols = st.columns(2)
         turnover_line = alt.Chart(history).mark_line(
             color=INVENTORY_SERIES_COLOR, point=alt.OverlayMarkDef(size=60, filled=True)
@@ -6079,7 +6895,8 @@ def render_inventory_tab(
         )
         chart_cols = st.columns(2)
         category_qty = (
-            merged_df.groupby("category")["quantity"].sum().reset_index().sort_values("quantity", ascending=False).head(10)
+            rollup_product_summary(product_summary, "category", "quantity")
+            .nlargest(10, "quantity")
         )
         if not category_qty.empty:
             category_qty.rename(columns={"quantity": "販売数量"}, inplace=True)
@@ -6124,7 +6941,8 @@ def render_inventory_tab(
             chart_cols[0].info("カテゴリ別の販売数量が算出できませんでした。")
 
         product_qty = (
-            merged_df.groupby("product_name")["quantity"].sum().reset_index().sort_values("quantity", ascending=False).head(10)
+            rollup_product_summary(product_summary, "product_name", "quantity")
+            .nlargest(10, "quantity")
         )
         if not product_qty.empty:
             product_qty.rename(columns={"quantity": "販売数量"}, inplace=True)
@@ -6197,8 +7015,8 @@ def render_inventory_tab(
             },
             inplace=True,
         )
-        rules_display["サポート率"] = rules_display["サポート率"].map(lambda v: f"{v:.1%}")
-        rules_display["信頼度"] = rules_display["信頼度"].map(lambda v: f"{v:.1%}")
+        rules_display["サポート率"] = rules_display["サポート率"].map("{:.1%}".format)
+        rules_display["信頼度"] = rules_display["信頼度"].map("{:.1%}".format)
         rules_display["リフト値"] = rules_display["リフト値"].map(lambda v: f"{v:.2f}" if pd.notna(v) else "-")
         st.dataframe(rules_display, hide_index=True, use_container_width=True)
 
@@ -6214,14 +7032,9 @@ def render_inventory_tab(
         if merged_df is None or merged_df.empty:
             st.info("データがありません。")
         else:
-            detail_df = (
-                merged_df.groupby(["product_code", "product_name", "category"])
-                .agg(
-                    販売数量=("quantity", "sum"),
-                    売上高=("sales_amount", "sum"),
-                    推定原価=("estimated_cost", "sum"),
-                )
-                .reset_index()
+            detail_df = product_detail_table(
+                product_summary,
+                {"quantity": "販売数量", "sales_amount": "売上高", "estimated_cost": "推定原価"},
             )
             if detail_df.empty:
                 st.info("表示できる明細がありません。")
@@ -6232,11 +7045,13 @@ def render_inventory_tab(
                 else:
                     detail_df["推定在庫金額"] = np.nan
                 detail_df.sort_values("推定在庫金額", ascending=False, inplace=True)
-                display_df = detail_df.copy()
-                display_df["販売数量"] = display_df["販売数量"].map(lambda v: f"{v:,.0f}")
-                for column in ["売上高", "推定原価", "推定在庫金額"]:
-                    display_df[column] = display_df[column].map(lambda v: f"{v:,.0f}" if pd.notna(v) else "-")
-                st.dataframe(display_df.head(50), hide_index=True, use_container_width=True)
+                display_df = detail_df.head(50)
+                st.dataframe(
+                    display_df,
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config=number_column_config(display_df, INVENTORY_DETAIL_FORMATS),
+                )
                 toolbar = st.columns(2)
                 with toolbar[0]:
                     download_button_from_df("CSV出力", detail_df, "inventory_overview.csv")
@@ -6261,9 +7076,10 @@ def render_cash_tab(
             "<div class='chart-section__header'><div class='chart-section__title'>キャッシュ残高推移</div></div>",
             unsafe_allow_html=True,
         )
-        forecast_df = cash_forecast.copy()
-        forecast_df["period_start"] = forecast_df["month"].dt.to_timestamp()
-        forecast_df["period_label"] = forecast_df["month"].astype(str)
+        forecast_df = cash_forecast.assign(
+            period_start=lambda d: d["month"].dt.to_timestamp(),
+            period_label=lambda d: d["month"].astype(str),
+        )
         cash_line = alt.Chart(forecast_df).mark_line(
             color=CASH_SERIES_COLOR, point=alt.OverlayMarkDef(size=60, filled=True)
         ).encode(
@@ -6317,8 +7133,7 @@ def render_cash_tab(
             "<div class='chart-section__header'><div class='chart-section__title'>キャッシュフロー内訳</div></div>",
             unsafe_allow_html=True,
         )
-        plan_df = cash_plan.copy()
-        plan_df["period_start"] = plan_df["month"].dt.to_timestamp()
+        plan_df = cash_plan.assign(period_start=lambda d: d["month"].dt.to_timestamp())
         melted = plan_df.melt(
             id_vars=["period_start"],
             value_vars=["operating_cf", "investment_cf", "financing_cf", "loan_repayment"],
@@ -6423,7 +7238,7 @@ def render_fixed_cost_breakdown(
     if expense_df is not None and isinstance(expense_df, pd.DataFrame) and not expense_df.empty:
         working = expense_df.copy()
     else:
-        working = pd.DataFrame(EXPENSE_PLAN_TEMPLATES.get("スリム型コスト構成", []))
+        working = get_expense_plan_template_df("スリム型コスト構成")
 
     if working.empty:
         st.info("固定費内訳を表示するデータがありません。")
@@ -6574,7 +7389,7 @@ def render_data_status_section(
 
     if merged_df is not None and not merged_df.empty:
         channel_summary = (
-            merged_df.groupby("channel")
+            merged_df.groupby("channel", observed=True)
             .agg(
                 records=("sales_amount", "size"),
                 amount=("sales_amount", "sum"),
@@ -6754,7 +7569,7 @@ def normalize_scenario_input(df: Optional[pd.DataFrame]) -> pd.DataFrame:
         working.rename(columns={sales_col: "sales_amount"}, inplace=True)
     if "sales_amount" not in working.columns:
         working["sales_amount"] = 0.0
-    working["sales_amount"] = pd.to_numeric(working["sales_amount"], errors="coerce").fillna(0.0)
+    working["sales_amount"] = coerce_numeric_column(working["sales_amount"])
 
     date_col = _match_column(["order_date", "date", "日付", "年月日", "month"])
     year_col = _match_column(["year", "年度", "会計年度"])
@@ -7101,7 +7916,7 @@ def render_scenario_analysis_section(
     if isinstance(base_df, pd.DataFrame) and not base_df.empty and "sales_amount" in base_df.columns:
         if "order_month" not in base_df.columns:
             base_df["order_month"] = pd.PeriodIndex(pd.to_datetime(base_df["order_date"]), freq="M")
-        monthly_sales = base_df.groupby("order_month")["sales_amount"].sum().sort_index()
+        monthly_sales = base_df.groupby("order_month", sort=False)["sales_amount"].sum().sort_index()
 
     with tabs[0]:
         st.header("入力データ")
@@ -7116,10 +7931,7 @@ def render_scenario_analysis_section(
         st.caption("フォーマット例を確認したい場合はサンプルCSVをご利用ください。")
         if uploaded_file is not None:
             try:
-                if uploaded_file.name.lower().endswith(".csv"):
-                    raw_df = pd.read_csv(uploaded_file)
-                else:
-                    raw_df = pd.read_excel(uploaded_file)
+                raw_df = read_tabular_file(uploaded_file)
                 normalized_df = normalize_scenario_input(raw_df)
                 st.session_state["scenario_uploaded_df"] = normalized_df
                 st.success("アップロードしたデータをシナリオ基礎データとして設定しました。")
@@ -7870,6 +8682,172 @@ def render_sales_upload_wizard(
     return channel_files
 
 
+@fragment_section
+def render_sales_analysis_section(
+    merged_df: pd.DataFrame,
+    selected_freq: str,
+    selected_granularity_label: str,
+    fixed_cost: float,
+) -> None:
+    """売上分析ページを描画する（グラフ操作時はこのセクションのみ再実行）。"""
+
+    st.subheader("売上分析")
+    if merged_df.empty:
+        st.info("売上データがありません。")
+    else:
+        st.caption("グラフをクリックすると他の可視化も同じ条件で絞り込まれます。")
+        sales_cross_filters = st.session_state.setdefault(
+            "sales_cross_filters", {"channel": None, "category": None}
+        )
+
+        available_analysis_channels = sorted(merged_df["channel"].unique())
+        available_analysis_categories = sorted(merged_df["category"].unique())
+        if (
+            sales_cross_filters.get("channel")
+            and sales_cross_filters["channel"] not in available_analysis_channels
+        ):
+            sales_cross_filters["channel"] = None
+        if (
+            sales_cross_filters.get("category")
+            and sales_cross_filters["category"] not in available_analysis_categories
+        ):
+            sales_cross_filters["category"] = None
+
+        analysis_df = merged_df.copy()
+        active_highlights: List[str] = []
+        if sales_cross_filters.get("channel"):
+            analysis_df = analysis_df[analysis_df["channel"] == sales_cross_filters["channel"]]
+            active_highlights.append(f"チャネル: {sales_cross_filters['channel']}")
+        if sales_cross_filters.get("category"):
+            analysis_df = analysis_df[analysis_df["category"] == sales_cross_filters["category"]]
+            active_highlights.append(f"カテゴリ: {sales_cross_filters['category']}")
+
+        if active_highlights:
+            info_col, clear_col = st.columns([5, 1])
+            info_col.info("ハイライト適用中: " + " / ".join(active_highlights))
+            if clear_col.button("ハイライトをクリア", key="clear_sales_highlight"):
+                st.session_state["sales_cross_filters"] = {"channel": None, "category": None}
+                analysis_df = merged_df.copy()
+                active_highlights = []
+
+        channel_trend_full = merged_df.copy()
+        channel_trend_full["period"] = channel_trend_full["order_date"].dt.to_period(selected_freq)
+        channel_trend_full = (
+            channel_trend_full.groupby(["period", "channel"], observed=True)["sales_amount"].sum().reset_index()
+        )
+        channel_trend_full["period_start"] = channel_trend_full["period"].dt.to_timestamp()
+        channel_trend_full["period_label"] = format_period_labels(
+            channel_trend_full["period"], selected_freq
+        )
+        channel_trend_full.sort_values(["channel", "period_start"], inplace=True)
+
+        channel_chart = px.line(
+            channel_trend_full,
+            x="period_start",
+            y="sales_amount",
+            color="channel",
+            markers=True,
+            labels={
+                "sales_amount": "売上高",
+                "period_start": f"{selected_granularity_label}開始日",
+            },
+            custom_data=["channel", "period_label"],
+            color_discrete_sequence=PLOTLY_COLORWAY,
+        )
+        channel_chart = downsample_line_traces(apply_chart_theme(channel_chart))
+        channel_chart.update_layout(
+            clickmode="event+select",
+            legend=dict(title="", itemclick="toggleothers", itemdoubleclick="toggle"),
+        )
+        for trace in channel_chart.data:
+            trace.update(
+                hovertemplate="期間=%{customdata[1]}<br>チャネル=%{customdata[0]}<br>売上高=%{y:,.0f}円<extra></extra>"
+            )
+            if sales_cross_filters.get("channel") and trace.name != sales_cross_filters["channel"]:
+                trace.update(opacity=0.25, line={"width": 1})
+            else:
+                trace.update(line={"width": 3})
+        channel_chart.update_layout(height=420)
+        render_clickable_plotly_chart(
+            channel_chart,
+            key="channel_trend_events",
+            on_point_select=lambda point: set_sales_cross_filter(
+                "channel", point["customdata"][0] if point else None
+            ),
+        )
+
+        category_sales_full = merged_df.copy()
+        category_sales_full["period"] = category_sales_full["order_date"].dt.to_period(selected_freq)
+        category_sales_full = (
+            category_sales_full.groupby(["period", "category"], observed=True)["sales_amount"].sum().reset_index()
+        )
+        category_sales_full["period_start"] = category_sales_full["period"].dt.to_timestamp()
+        category_sales_full["period_label"] = format_period_labels(
+            category_sales_full["period"], selected_freq
+        )
+        category_sales_full.sort_values(["category", "period_start"], inplace=True)
+
+        category_bar = px.bar(
+            category_sales_full,
+            x="period_start",
+            y="sales_amount",
+            color="category",
+            labels={
+                "sales_amount": "売上高",
+                "period_start": f"{selected_granularity_label}開始日",
+            },
+            custom_data=["category", "period_label"],
+            color_discrete_sequence=PLOTLY_COLORWAY,
+        )
+        category_bar = apply_chart_theme(category_bar)
+        category_bar.update_layout(
+            barmode="stack",
+            clickmode="event+select",
+            legend=dict(title="", itemclick="toggleothers", itemdoubleclick="toggle"),
+        )
+        for trace in category_bar.data:
+            trace.update(
+                hovertemplate="期間=%{customdata[1]}<br>カテゴリ=%{customdata[0]}<br>売上高=%{y:,.0f}円<extra></extra>"
+            )
+            if sales_cross_filters.get("category") and trace.name != sales_cross_filters["category"]:
+                trace.update(opacity=0.35)
+            else:
+                trace.update(opacity=0.9)
+        category_bar.update_layout(height=420)
+        render_clickable_plotly_chart(
+            category_bar,
+            key="category_sales_events",
+            on_point_select=lambda point: set_sales_cross_filter(
+                "category", point["customdata"][0] if point else None
+            ),
+        )
+
+        analysis_summary = summarize_sales_by_period(analysis_df, selected_freq)
+        if analysis_df.empty:
+            st.warning("選択された条件に該当するデータがありません。")
+        elif analysis_summary.empty:
+            st.info("指定した粒度で集計できる期間データがありません。")
+        else:
+            yoy_table = analysis_summary.tail(12)[
+                ["period_label", "sales_amount", "sales_yoy", "sales_mom"]
+            ]
+            yoy_table = yoy_table.rename(
+                columns={
+                    "period_label": "期間",
+                    "sales_amount": "売上高",
+                    "sales_yoy": "前年同期比",
+                    "sales_mom": "前期比",
+                }
+            )
+            st.dataframe(yoy_table)
+
+        st.markdown("### 店舗別売上・利益比較")
+        render_store_comparison_chart(analysis_df, fixed_cost)
+
+        st.markdown("### ABC分析（売上上位30商品）")
+        render_abc_analysis(analysis_df)
+
+
 def main() -> None:
     init_phase2_session_state()
     ensure_saved_filters_loaded()
@@ -8041,10 +9019,7 @@ def main() -> None:
                     status_level = "ok"
                 icon, status_label = STATUS_PILL_DETAILS.get(status_level, ("ℹ️", "情報"))
                 st.markdown(
-                    f"<div class='status-pill status-pill--{status_level}'>{icon} 状態: {status_label}</div>",
-                    unsafe_allow_html=True,
-                )
-                st.markdown(
+                    f"<div class='status-pill status-pill--{status_level}'>{icon} 状態: {status_label}</div>"
                     f"<div class='sidebar-meta'>最終取得: {last_fetch.strftime('%Y-%m-%d %H:%M')} / {record_count:,} 件</div>",
                     unsafe_allow_html=True,
                 )
@@ -8186,7 +9161,7 @@ def main() -> None:
     merged_full = merge_sales_and_costs(sales_df, cost_df)
     sales_validation.extend(validate_channel_fees(merged_full))
 
-    freq_lookup = {label: freq for label, freq in PERIOD_FREQ_OPTIONS}
+    freq_lookup = PERIOD_FREQ_LOOKUP
     freq_labels = list(freq_lookup.keys())
     default_freq_label = next(
         (label for label, freq in PERIOD_FREQ_OPTIONS if freq == "M"),
@@ -8206,7 +9181,8 @@ def main() -> None:
     if "store" in sales_df.columns:
         candidate_values = [str(value) for value in sales_df["store"].dropna().unique()]
         store_candidates.extend(candidate_values)
-    store_candidates.extend(option for option in DEFAULT_STORE_OPTIONS if option not in store_candidates)
+    known_stores = set(store_candidates)
+    store_candidates.extend(option for option in DEFAULT_STORE_OPTIONS if option not in known_stores)
     store_options = list(dict.fromkeys(store_candidates)) or ["全社"]
     if "全社" in store_options:
         preferred_store = "全社"
@@ -8425,8 +9401,8 @@ def main() -> None:
 
     alerts = build_alerts(monthly_summary, kpis, default_cash_forecast)
 
-    channel_share_df = compute_channel_share(merged_df)
-    category_share_df = compute_category_share(merged_df)
+    channel_share_df = compute_channel_share_cached(merged_df)
+    category_share_df = compute_category_share_cached(merged_df)
 
     latest_timestamp = None
     if not merged_df.empty and "order_date" in merged_df.columns:
@@ -8511,8 +9487,7 @@ def main() -> None:
             render_status_banner(alerts)
             st.caption(f"対象期間: {period_start} 〜 {period_end}")
 
-            kpi_metrics = render_first_level_kpi_strip(kpi_period_summary, selected_kpi_row)
-            render_active_kpi_details(kpi_period_summary, kpi_metrics)
+            render_kpi_drilldown_section(kpi_period_summary, selected_kpi_row)
 
             primary_tab_entries = [
                 ("売上", "📈"),
@@ -8570,173 +9545,12 @@ def main() -> None:
             st.divider()
 
     elif selected_nav_key == "sales":
-        st.subheader("売上分析")
-        if merged_df.empty:
-            st.info("売上データがありません。")
-        else:
-            st.caption("グラフをクリックすると他の可視化も同じ条件で絞り込まれます。")
-            sales_cross_filters = st.session_state.setdefault(
-                "sales_cross_filters", {"channel": None, "category": None}
-            )
-
-            available_analysis_channels = sorted(merged_df["channel"].unique())
-            available_analysis_categories = sorted(merged_df["category"].unique())
-            if (
-                sales_cross_filters.get("channel")
-                and sales_cross_filters["channel"] not in available_analysis_channels
-            ):
-                sales_cross_filters["channel"] = None
-            if (
-                sales_cross_filters.get("category")
-                and sales_cross_filters["category"] not in available_analysis_categories
-            ):
-                sales_cross_filters["category"] = None
-
-            analysis_df = merged_df.copy()
-            active_highlights: List[str] = []
-            if sales_cross_filters.get("channel"):
-                analysis_df = analysis_df[analysis_df["channel"] == sales_cross_filters["channel"]]
-                active_highlights.append(f"チャネル: {sales_cross_filters['channel']}")
-            if sales_cross_filters.get("category"):
-                analysis_df = analysis_df[analysis_df["category"] == sales_cross_filters["category"]]
-                active_highlights.append(f"カテゴリ: {sales_cross_filters['category']}")
-
-            if active_highlights:
-                info_col, clear_col = st.columns([5, 1])
-                info_col.info("ハイライト適用中: " + " / ".join(active_highlights))
-                if clear_col.button("ハイライトをクリア", key="clear_sales_highlight"):
-                    st.session_state["sales_cross_filters"] = {"channel": None, "category": None}
-                    analysis_df = merged_df.copy()
-                    active_highlights = []
-
-            channel_trend_full = merged_df.copy()
-            channel_trend_full["period"] = channel_trend_full["order_date"].dt.to_period(selected_freq)
-            channel_trend_full = (
-                channel_trend_full.groupby(["period", "channel"])["sales_amount"].sum().reset_index()
-            )
-            channel_trend_full["period_start"] = channel_trend_full["period"].dt.to_timestamp()
-            channel_trend_full["period_label"] = channel_trend_full["period"].apply(
-                lambda p: format_period_label(p, selected_freq)
-            )
-            channel_trend_full.sort_values(["channel", "period_start"], inplace=True)
-
-            channel_chart = px.line(
-                channel_trend_full,
-                x="period_start",
-                y="sales_amount",
-                color="channel",
-                markers=True,
-                labels={
-                    "sales_amount": "売上高",
-                    "period_start": f"{selected_granularity_label}開始日",
-                },
-                custom_data=["channel", "period_label"],
-                color_discrete_sequence=PLOTLY_COLORWAY,
-            )
-            channel_chart = apply_chart_theme(channel_chart)
-            channel_chart.update_layout(
-                clickmode="event+select",
-                legend=dict(title="", itemclick="toggleothers", itemdoubleclick="toggle"),
-            )
-            for trace in channel_chart.data:
-                trace.update(
-                    hovertemplate="期間=%{customdata[1]}<br>チャネル=%{customdata[0]}<br>売上高=%{y:,.0f}円<extra></extra>"
-                )
-                if sales_cross_filters.get("channel") and trace.name != sales_cross_filters["channel"]:
-                    trace.update(opacity=0.25, line={"width": 1})
-                else:
-                    trace.update(line={"width": 3})
-            channel_events = plotly_events(
-                channel_chart,
-                click_event=True,
-                override_width="100%",
-                override_height=420,
-                key="channel_trend_events",
-            )
-            if channel_events:
-                clicked_channel = channel_events[0]["customdata"][0]
-                current = st.session_state["sales_cross_filters"].get("channel")
-                if current == clicked_channel:
-                    st.session_state["sales_cross_filters"]["channel"] = None
-                else:
-                    st.session_state["sales_cross_filters"]["channel"] = clicked_channel
-
-            category_sales_full = merged_df.copy()
-            category_sales_full["period"] = category_sales_full["order_date"].dt.to_period(selected_freq)
-            category_sales_full = (
-                category_sales_full.groupby(["period", "category"])["sales_amount"].sum().reset_index()
-            )
-            category_sales_full["period_start"] = category_sales_full["period"].dt.to_timestamp()
-            category_sales_full["period_label"] = category_sales_full["period"].apply(
-                lambda p: format_period_label(p, selected_freq)
-            )
-            category_sales_full.sort_values(["category", "period_start"], inplace=True)
-
-            category_bar = px.bar(
-                category_sales_full,
-                x="period_start",
-                y="sales_amount",
-                color="category",
-                labels={
-                    "sales_amount": "売上高",
-                    "period_start": f"{selected_granularity_label}開始日",
-                },
-                custom_data=["category", "period_label"],
-                color_discrete_sequence=PLOTLY_COLORWAY,
-            )
-            category_bar = apply_chart_theme(category_bar)
-            category_bar.update_layout(
-                barmode="stack",
-                clickmode="event+select",
-                legend=dict(title="", itemclick="toggleothers", itemdoubleclick="toggle"),
-            )
-            for trace in category_bar.data:
-                trace.update(
-                    hovertemplate="期間=%{customdata[1]}<br>カテゴリ=%{customdata[0]}<br>売上高=%{y:,.0f}円<extra></extra>"
-                )
-                if sales_cross_filters.get("category") and trace.name != sales_cross_filters["category"]:
-                    trace.update(opacity=0.35)
-                else:
-                    trace.update(opacity=0.9)
-            category_events = plotly_events(
-                category_bar,
-                click_event=True,
-                override_width="100%",
-                override_height=420,
-                key="category_sales_events",
-            )
-            if category_events:
-                clicked_category = category_events[0]["customdata"][0]
-                current_category = st.session_state["sales_cross_filters"].get("category")
-                if current_category == clicked_category:
-                    st.session_state["sales_cross_filters"]["category"] = None
-                else:
-                    st.session_state["sales_cross_filters"]["category"] = clicked_category
-
-            analysis_summary = summarize_sales_by_period(analysis_df, selected_freq)
-            if analysis_df.empty:
-                st.warning("選択された条件に該当するデータがありません。")
-            elif analysis_summary.empty:
-                st.info("指定した粒度で集計できる期間データがありません。")
-            else:
-                yoy_table = analysis_summary.tail(12)[
-                    ["period_label", "sales_amount", "sales_yoy", "sales_mom"]
-                ]
-                yoy_table = yoy_table.rename(
-                    columns={
-                        "period_label": "期間",
-                        "sales_amount": "売上高",
-                        "sales_yoy": "前年同期比",
-                        "sales_mom": "前期比",
-                    }
-                )
-                st.dataframe(yoy_table)
-
-            st.markdown("### 店舗別売上・利益比較")
-            render_store_comparison_chart(analysis_df, fixed_cost)
-
-            st.markdown("### ABC分析（売上上位30商品）")
-            render_abc_analysis(analysis_df)
+        render_sales_analysis_section(
+            merged_df,
+            selected_freq,
+            selected_granularity_label,
+            fixed_cost,
+        )
 
     elif selected_nav_key == "gross":
         st.subheader("利益分析")
@@ -8744,7 +9558,7 @@ def main() -> None:
             st.info("データがありません。")
         else:
             product_profit = (
-                merged_df.groupby(["product_code", "product_name", "category"], as_index=False)[
+                merged_df.groupby(["product_code", "product_name", "category"], as_index=False, observed=True)[
                     [
                         "sales_amount",
                         "estimated_cost",
@@ -8761,10 +9575,9 @@ def main() -> None:
                 product_profit["sales_amount"] / product_profit["quantity"],
                 np.nan,
             )
-            product_profit["ad_ratio"] = np.where(
-                product_profit["sales_amount"] != 0,
-                product_profit["channel_fee_amount"] / product_profit["sales_amount"],
-                np.nan,
+            product_profit["ad_ratio"] = divide_or_nan(
+                product_profit["channel_fee_amount"].to_numpy(dtype=float),
+                product_profit["sales_amount"].to_numpy(dtype=float),
             )
             product_profit.sort_values("net_gross_profit", ascending=False, inplace=True)
             display_columns = {
@@ -8793,7 +9606,7 @@ def main() -> None:
             )
 
             channel_profit = (
-                merged_df.groupby("channel")["net_gross_profit"].sum().reset_index()
+                merged_df.groupby("channel", observed=True)["net_gross_profit"].sum().reset_index()
             )
             channel_profit_chart = px.bar(
                 channel_profit,
@@ -8844,20 +9657,13 @@ def main() -> None:
                 yaxis_title="商品名",
                 clickmode="event+select",
             )
-            events_top_products = plotly_events(
+            render_clickable_plotly_chart(
                 top_products_chart,
-                click_event=True,
-                override_width="100%",
-                override_height=420,
                 key="top_products_events",
+                on_point_select=lambda point: st.session_state.update(
+                    profit_focus_product=point["customdata"][0] if point else None
+                ),
             )
-            if events_top_products:
-                clicked_code = events_top_products[0]["customdata"][0]
-                current_code = st.session_state.get("profit_focus_product")
-                if current_code == clicked_code:
-                    st.session_state["profit_focus_product"] = None
-                else:
-                    st.session_state["profit_focus_product"] = clicked_code
 
             focus_code = st.session_state.get("profit_focus_product")
             if focus_code is None and not product_profit.empty:
@@ -8893,16 +9699,15 @@ def main() -> None:
 
                 product_detail = merged_df[merged_df["product_code"] == focus_code].copy()
                 channel_breakdown = (
-                    product_detail.groupby("channel")[
+                    product_detail.groupby("channel", observed=True)[
                         ["sales_amount", "net_gross_profit", "quantity", "channel_fee_amount"]
                     ]
                     .sum()
                     .reset_index()
                 )
-                channel_breakdown["広告費比率"] = np.where(
-                    channel_breakdown["sales_amount"] != 0,
-                    channel_breakdown["channel_fee_amount"] / channel_breakdown["sales_amount"],
-                    np.nan,
+                channel_breakdown["広告費比率"] = divide_or_nan(
+                    channel_breakdown["channel_fee_amount"].to_numpy(dtype=float),
+                    channel_breakdown["sales_amount"].to_numpy(dtype=float),
                 )
                 if not channel_breakdown.empty:
                     breakdown_chart = px.bar(
@@ -8951,8 +9756,8 @@ def main() -> None:
                 )
                 if not product_trend_summary.empty:
                     product_trend_summary["period_start"] = product_trend_summary["period"].dt.to_timestamp()
-                    product_trend_summary["period_label"] = product_trend_summary["period"].apply(
-                        lambda p: format_period_label(p, selected_freq)
+                    product_trend_summary["period_label"] = format_period_labels(
+                        product_trend_summary["period"], selected_freq
                     )
                     profit_trend_chart = px.line(
                         product_trend_summary,
@@ -8966,7 +9771,9 @@ def main() -> None:
                         hover_data={"period_label": True},
                         color_discrete_sequence=[GROSS_SERIES_COLOR],
                     )
-                    profit_trend_chart = apply_chart_theme(profit_trend_chart)
+                    profit_trend_chart = downsample_line_traces(
+                        apply_chart_theme(profit_trend_chart)
+                    )
                     profit_trend_chart.update_layout(title="選択商品の粗利推移")
                     st.plotly_chart(profit_trend_chart, use_container_width=True)
                     st.dataframe(
@@ -9174,13 +9981,13 @@ def main() -> None:
                 ]
                 breakdown_tables: List[Tuple[str, str, str, pd.DataFrame]] = []
                 for title, column, label in breakdown_configs:
-                    df_breakdown = compute_kpi_breakdown(
+                    df_breakdown = compute_kpi_breakdown_cached(
                         segmented_target_df, column, kpi_totals=kpis
                     )
                     breakdown_tables.append((title, column, label, df_breakdown))
 
                 if "campaign" in segmented_target_df.columns:
-                    campaign_breakdown = compute_kpi_breakdown(
+                    campaign_breakdown = compute_kpi_breakdown_cached(
                         segmented_target_df, "campaign", kpi_totals=kpis
                     )
                     breakdown_tables.append(
@@ -9453,9 +10260,10 @@ def main() -> None:
             st.dataframe(merged_full.head(100))
 
         st.markdown("テンプレート/サンプルデータのダウンロード")
-        download_button_from_df("サンプル売上データ", generate_sample_sales_data().head(200), "sample_sales.csv")
-        download_button_from_df("サンプル原価率データ", generate_sample_cost_data(), "sample_cost.csv")
-        download_button_from_df("サンプルKPIデータ", generate_sample_subscription_data(), "sample_kpi.csv")
+        sample_sales, sample_cost, sample_subscription = load_sample_data()
+        download_button_from_df("サンプル売上データ", sample_sales.head(200), "sample_sales.csv")
+        download_button_from_df("サンプル原価率データ", sample_cost, "sample_cost.csv")
+        download_button_from_df("サンプルKPIデータ", sample_subscription, "sample_kpi.csv")
 
         st.markdown("---")
         st.markdown("アプリの使い方や改善要望があれば開発チームまでご連絡ください。")
@@ -18,6 +18,23 @@ try:  # Optional dependency for時系列予測
 except Exception:  # pragma: no cover - statsmodelsが未導入の場合に備える
     ARIMA = None
 
+try:  # Optional dependency for高速なCSV読み込み
+    import pyarrow  # type: ignore  # noqa: F401
+
+    CSV_READ_ENGINE = "pyarrow"
+except Exception:  # pragma: no cover - pyarrowが未導入の場合はCエンジンを利用
+    CSV_READ_ENGINE = "c"
+
+try:  # Optional dependency for高速なExcel読み込み
+    import python_calamine  # type: ignore  # noqa: F401
+
+    EXCEL_READ_ENGINE: Optional[str] = "calamine"
+except Exception:  # pragma: no cover - 未導入の場合はpandasの既定エンジンを利用
+    EXCEL_READ_ENGINE = None
+
+# Excelファイル判定用のシグネチャ（xlsx=ZIP, xls=OLE2）
+EXCEL_FILE_SIGNATURES = (b"PK\x03\x04", b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1")
+
 # 共通で利用する列名の定義
 NORMALIZED_SALES_COLUMNS = [
     "order_date",
@@ -73,6 +90,9 @@ DEFAULT_CHANNEL_FEE_RATES: Dict[str, float] = {
     "Yahoo!ショッピング": 0.10,
 }
 
+# 語彙の少ない文字列列はcategory型で保持し、フィルタや集計を整数コードで処理する
+CATEGORICAL_SALES_COLUMNS: Tuple[str, ...] = ("channel", "category", "store")
+
 DEFAULT_FIXED_COST = 2_500_000  # 人件費や管理費などの固定費（目安）
 DEFAULT_LOAN_REPAYMENT = 600_000  # 月次の借入返済額の仮値
 DEFAULT_DORMANCY_DAYS = 120  # 休眠判定に用いる前回購入からの日数
@@ -182,6 +202,47 @@ def detect_channel_from_filename(filename: Optional[str]) -> Optional[str]:
     return None
 
 
+def _rewind(uploaded_file) -> None:
+    """アップロードファイルの読み込み位置を先頭に戻す。"""
+    try:
+        uploaded_file.seek(0)
+    except Exception:  # pragma: no cover - Streamlit's UploadedFile may not support seek
+        pass
+
+
+def is_excel_file(uploaded_file) -> bool:
+    """先頭バイトとファイル名からExcelファイルかどうかを判定する。"""
+    _rewind(uploaded_file)
+    try:
+        header = uploaded_file.read(8)
+    except Exception:  # pragma: no cover - 読み込めない場合は拡張子のみで判定
+        header = b""
+    finally:
+        _rewind(uploaded_file)
+    if isinstance(header, bytes) and header:
+        return header.startswith(EXCEL_FILE_SIGNATURES)
+    name = str(getattr(uploaded_file, "name", "") or "").lower()
+    return name.endswith((".xlsx", ".xlsm", ".xls"))
+
+
+def read_tabular_file(uploaded_file) -> pd.DataFrame:
+    """Excel/CSVを形式判定したうえで高速なエンジンを優先して読み込む。"""
+    if is_excel_file(uploaded_file):
+        if EXCEL_READ_ENGINE:
+            try:
+                return pd.read_excel(uploaded_file, engine=EXCEL_READ_ENGINE)
+            except Exception:
+                _rewind(uploaded_file)
+        return pd.read_excel(uploaded_file)
+
+    if CSV_READ_ENGINE != "c":
+        try:
+            return pd.read_csv(uploaded_file, engine=CSV_READ_ENGINE)
+        except Exception:
+            _rewind(uploaded_file)
+    return pd.read_csv(uploaded_file)
+
+
 def _build_rename_map(columns: Iterable[str], alias_config: Dict[str, List[str]]) -> Dict[str, str]:
     """指定した列から正規化用のrename辞書を作成する。"""
     rename_map: Dict[str, str] = {}
@@ -375,29 +436,13 @@ def load_sales_workbook(
     if uploaded_file is None:
         return pd.DataFrame(columns=NORMALIZED_SALES_COLUMNS), ValidationReport()
 
-    try:
-        uploaded_file.seek(0)
-    except Exception:  # pragma: no cover - Streamlit's UploadedFile may not support seek
-        pass
-
     read_errors: List[str] = []
 
     try:
-        df = pd.read_excel(uploaded_file)
-    except ValueError as exc:
+        df = read_tabular_file(uploaded_file)
+    except pd.errors.EmptyDataError as exc:
         read_errors.append(str(exc))
-        try:
-            uploaded_file.seek(0)
-        except Exception:  # pragma: no cover - as above
-            pass
-        try:
-            df = pd.read_csv(uploaded_file)
-        except pd.errors.EmptyDataError as exc:
-            read_errors.append(str(exc))
-            df = pd.DataFrame()
-        except Exception as exc:  # pragma: no cover - unexpected parsers
-            read_errors.append(str(exc))
-            df = pd.DataFrame()
+        df = pd.DataFrame()
     except Exception as exc:  # pragma: no cover - general fallback
         read_errors.append(str(exc))
         df = pd.DataFrame()
@@ -424,6 +469,16 @@ def load_sales_workbook(
     return normalized, validation
 
 
+def categorize_sales_columns(
+    df: pd.DataFrame, columns: Iterable[str] = CATEGORICAL_SALES_COLUMNS
+) -> pd.DataFrame:
+    """チャネル・カテゴリ・店舗などの列をcategory型に変換する。"""
+    for column in columns:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    return df
+
+
 def load_sales_files(files_by_channel: Dict[str, List]) -> Tuple[pd.DataFrame, ValidationReport]:
     """チャネルごとのファイル群を統合した売上データを作成する。"""
 
@@ -527,11 +582,7 @@ def load_cost_workbook(uploaded_file) -> pd.DataFrame:
     if uploaded_file is None:
         return pd.DataFrame(columns=["product_code", "product_name", "category", "price", "cost", "cost_rate"])
 
-    try:
-        df = pd.read_excel(uploaded_file)
-    except ValueError:
-        uploaded_file.seek(0)
-        df = pd.read_csv(uploaded_file)
+    df = read_tabular_file(uploaded_file)
 
     rename_map = _build_rename_map(df.columns, COST_COLUMN_ALIASES)
     normalized = df.rename(columns=rename_map)
@@ -573,11 +624,7 @@ def load_subscription_workbook(uploaded_file) -> pd.DataFrame:
             ]
         )
 
-    try:
-        df = pd.read_excel(uploaded_file)
-    except ValueError:
-        uploaded_file.seek(0)
-        df = pd.read_csv(uploaded_file)
+    df = read_tabular_file(uploaded_file)
 
     rename_map = _build_rename_map(df.columns, SUBSCRIPTION_COLUMN_ALIASES)
     normalized = df.rename(columns=rename_map).copy()
@@ -635,7 +682,9 @@ def merge_sales_and_costs(sales_df: pd.DataFrame, cost_df: pd.DataFrame) -> pd.D
         merged["gross_margin_rate"] = 1 - merged["cost_rate"]
     merged["estimated_cost"] = merged["sales_amount"] * merged["cost_rate"]
     merged["gross_profit"] = merged["sales_amount"] - merged["estimated_cost"]
-    merged["channel_fee"] = merged["channel"].map(DEFAULT_CHANNEL_FEE_RATES).fillna(0)
+    merged["channel_fee"] = (
+        merged["channel"].map(DEFAULT_CHANNEL_FEE_RATES).astype(float).fillna(0)
+    )
     merged["channel_fee_amount"] = merged["sales_amount"] * merged["channel_fee"]
     merged["net_gross_profit"] = merged["gross_profit"] - merged["channel_fee_amount"]
     return merged
@@ -686,7 +735,7 @@ def aggregate_sales(df: pd.DataFrame, group_fields: List[str]) -> pd.DataFrame:
     """汎用的な売上集計処理。"""
     if df.empty:
         return pd.DataFrame(columns=group_fields + ["sales_amount"])
-    aggregated = df.groupby(group_fields)["sales_amount"].sum().reset_index()
+    aggregated = df.groupby(group_fields, observed=True)["sales_amount"].sum().reset_index()
     return aggregated
 
 
@@ -695,7 +744,7 @@ def monthly_sales_summary(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return pd.DataFrame(columns=["order_month", "sales_amount", "gross_profit", "net_gross_profit"])
     summary = (
-        df.groupby("order_month")[
+        df.groupby("order_month", sort=False)[
             ["sales_amount", "gross_profit", "net_gross_profit"]
         ]
         .sum()
@@ -722,7 +771,7 @@ def compute_channel_share(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return pd.DataFrame(columns=["channel", "sales_amount"])
     return (
-        df.groupby("channel")["sales_amount"].sum().reset_index().sort_values("sales_amount", ascending=False)
+        df.groupby("channel", observed=True)["sales_amount"].sum().reset_index().sort_values("sales_amount", ascending=False)
     )
 
 
@@ -731,7 +780,7 @@ def compute_category_share(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return pd.DataFrame(columns=["category", "sales_amount"])
     return (
-        df.groupby("category")["sales_amount"].sum().reset_index().sort_values("sales_amount", ascending=False)
+        df.groupby("category", observed=True)["sales_amount"].sum().reset_index().sort_values("sales_amount", ascending=False)
     )
 
 
@@ -821,6 +870,88 @@ def calculate_kpis(
     }
 
 
+def divide_or_nan(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """分母が0の要素をNaNとして配列同士の割り算を行う。"""
+
+    result = np.full(np.broadcast(numerator, denominator).shape, np.nan, dtype=float)
+    np.divide(numerator, denominator, out=result, where=denominator != 0)
+    return result
+
+
+def calculate_kpi_history(
+    merged_df: pd.DataFrame,
+    subscription_df: Optional[pd.DataFrame],
+    overrides: Optional[Dict[str, float]] = None,
+) -> pd.DataFrame:
+    """calculate_kpis と同じ指標を全月分まとめてベクトル演算で算出する。"""
+    overrides = overrides or {}
+    if merged_df.empty or "order_month" not in merged_df.columns:
+        return pd.DataFrame()
+
+    monthly = (
+        merged_df.groupby("order_month", sort=False)[["sales_amount", "net_gross_profit"]]
+        .sum()
+        .rename(columns={"sales_amount": "sales", "net_gross_profit": "gross_profit"})
+    )
+    # 売上データは読み込み時に日付順へ整列済みなので、通常は集計結果もそのまま月順になる
+    if not monthly.index.is_monotonic_increasing:
+        monthly = monthly.sort_index()
+    if monthly.empty:
+        return pd.DataFrame()
+    history = pd.DataFrame({"month": monthly.index}, index=monthly.index)
+    history["sales"] = monthly["sales"].astype(float)
+    history["gross_profit"] = monthly["gross_profit"].astype(float)
+
+    subscription_columns = [
+        "active_customers",
+        "new_customers",
+        "repeat_customers",
+        "cancelled_subscriptions",
+        "previous_active_customers",
+        "marketing_cost",
+        "ltv",
+    ]
+    if subscription_df is not None and not subscription_df.empty and "month" in subscription_df.columns:
+        subscription_months = pd.PeriodIndex(subscription_df["month"], freq="M")
+        # calculate_kpis と同様に同じ月の行が複数あれば先頭行を採用する
+        subscription_rows = (
+            subscription_df.set_axis(subscription_months, axis=0)
+            .reindex(columns=subscription_columns)
+            .astype(float)
+        )
+        subscription_rows = subscription_rows[~subscription_rows.index.duplicated(keep="first")]
+        subscription_rows = subscription_rows.reindex(history.index)
+    else:
+        subscription_rows = pd.DataFrame(np.nan, index=history.index, columns=subscription_columns)
+
+    for column in subscription_columns:
+        if column in overrides:
+            history[column] = overrides[column]
+        else:
+            history[column] = subscription_rows[column].to_numpy()
+        history[column] = history[column].astype(float)
+
+    sales = history["sales"].to_numpy()
+    gross_profit = history["gross_profit"].to_numpy()
+    active = history["active_customers"].to_numpy()
+    marketing = history["marketing_cost"].to_numpy()
+    history["arpu"] = divide_or_nan(sales, active)
+    history["repeat_rate"] = divide_or_nan(history["repeat_customers"].to_numpy(), active)
+    history["churn_rate"] = divide_or_nan(
+        history["cancelled_subscriptions"].to_numpy(),
+        history["previous_active_customers"].to_numpy(),
+    )
+    history["roas"] = divide_or_nan(sales, marketing)
+    history["adv_ratio"] = divide_or_nan(marketing, sales)
+    history["gross_margin_rate"] = divide_or_nan(gross_profit, sales)
+    history["cac"] = divide_or_nan(marketing, history["new_customers"].to_numpy())
+
+    for column in ("inventory_turnover_days", "stockout_rate", "training_sessions", "new_product_count"):
+        history[column] = overrides.get(column, np.nan)
+
+    return history.reset_index(drop=True)
+
+
 def annotate_customer_segments(
     df: pd.DataFrame,
     *,
@@ -1778,23 +1909,30 @@ def forecast_cashflow(plan_df: pd.DataFrame, starting_cash: float) -> pd.DataFra
     """キャッシュ残高推移を計算する。"""
     if plan_df.empty:
         return pd.DataFrame(columns=["month", "net_cf", "cash_balance"])
-    cash = starting_cash
-    records: List[Dict[str, object]] = []
-    for _, row in plan_df.iterrows():
-        operating_cf = float(row.get("operating_cf", 0.0))
-        investment_cf = float(row.get("investment_cf", 0.0))
-        financing_cf = float(row.get("financing_cf", 0.0))
-        loan_repayment = float(row.get("loan_repayment", 0.0))
-        net_cf = operating_cf + financing_cf - investment_cf - loan_repayment
-        cash += net_cf
-        records.append(
-            {
-                "month": row.get("month"),
-                "net_cf": net_cf,
-                "cash_balance": cash,
-            }
-        )
-    forecast_df = pd.DataFrame(records)
+
+    def _column_values(column: str) -> np.ndarray:
+        if column not in plan_df.columns:
+            return np.zeros(len(plan_df), dtype=float)
+        return plan_df[column].to_numpy(dtype=float)
+
+    net_cf = (
+        _column_values("operating_cf")
+        + _column_values("financing_cf")
+        - _column_values("investment_cf")
+        - _column_values("loan_repayment")
+    )
+    months = (
+        plan_df["month"].reset_index(drop=True)
+        if "month" in plan_df.columns
+        else pd.Series([None] * len(plan_df), dtype=object)
+    )
+    forecast_df = pd.DataFrame(
+        {
+            "month": months,
+            "net_cf": net_cf,
+            "cash_balance": float(starting_cash) + np.cumsum(net_cf),
+        }
+    )
     return forecast_df
 
 
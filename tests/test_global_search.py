@@ -0,0 +1,59 @@
+"""グローバル検索の描画経路を AppTest で確認するテスト。"""
+
+from pathlib import Path
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+REPO_ROOT = str(Path(__file__).resolve().parents[1])
+
+
+def _search_script(repo_root: str, query: str) -> None:
+    import sys
+
+    import pandas as pd
+
+    sys.path.insert(0, repo_root)
+    from app import render_global_search_results
+
+    merged_df = pd.DataFrame(
+        {
+            "order_date": pd.to_datetime(["2024-01-05", "2024-02-10", "2024-03-15"]),
+            "channel": pd.Categorical(["自社EC", "楽天市場", None]),
+            "category": pd.Categorical(["健康食品", "サプリ", "健康食品"]),
+            "product_name": ["乳酸菌 (30日分)", "フコイダン粒", None],
+            "sales_amount": [1200.0, 3400.0, 560.0],
+        }
+    )
+    render_global_search_results(query, merged_df)
+
+
+def _run_search(query: str) -> AppTest:
+    at = AppTest.from_function(_search_script, args=(REPO_ROOT, query), default_timeout=60)
+    at.run()
+    assert not at.exception
+    return at
+
+
+def _matched_dates(at: AppTest) -> list:
+    tables = [frame.value for frame in at.dataframe if "受注日" in frame.value.columns]
+    return sorted(tables[0]["受注日"].tolist()) if tables else []
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    [
+        ("ec", ["2024-01-05"]),  # category列は大文字小文字を区別しない
+        ("フコイダン", ["2024-02-10"]),  # 文字列列の部分一致
+        ("健康食品", ["2024-01-05", "2024-03-15"]),
+        ("(30日分)", ["2024-01-05"]),  # 正規表現の記号はそのまま文字として照合する
+    ],
+)
+def test_global_search_matches_sales_rows(query: str, expected: list) -> None:
+    assert _matched_dates(_run_search(query)) == expected
+
+
+def test_global_search_without_match_shows_message() -> None:
+    at = _run_search(".*")
+    assert _matched_dates(at) == []
+    assert any("一致する項目は見つかりませんでした" in caption.value for caption in at.caption)